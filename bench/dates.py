@@ -0,0 +1,73 @@
+"""Microbenchmark: extragerea datei publicării din anunțurile OLX.
+
+Compară scanarea recursivă (find_date_in_offer) cu DateExtractor (calea învățată).
+
+    python -m bench.dates                        # pagini sintetice din bench/data/offer.json
+    python -m bench.dates pagina1.json ...       # pagini înregistrate din api/v1/offers
+"""
+import argparse, copy, json, sys, timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from olx.dates import DateExtractor, find_date_in_offer
+
+TEMPLATE = Path(__file__).parent / "data" / "offer.json"
+
+def synthetic_pages(pages=25, per_page=40):
+    """Pagini de 40 de anunțuri construite din șablonul înregistrat, cu ID-uri și date diferite."""
+    template = json.loads(TEMPLATE.read_text(encoding="utf-8"))
+    now = datetime.now().replace(microsecond=0)
+    result = []
+    for p in range(pages):
+        offers = []
+        for i in range(per_page):
+            n = p * per_page + i
+            offer = copy.deepcopy(template)
+            offer["id"] = template["id"] + 1000 - n
+            stamp = (now - timedelta(minutes=7 * n)).isoformat() + "+03:00"
+            offer["created_time"] = offer["last_refresh_time"] = stamp
+            offers.append(offer)
+        result.append(offers)
+    return result
+
+def recorded_pages(paths):
+    return [json.loads(Path(p).read_text(encoding="utf-8")).get("data", []) for p in paths]
+
+def run_scan(pages):
+    return [find_date_in_offer(offer) for offers in pages for offer in offers]
+
+def run_extractor(pages):
+    extractor = DateExtractor()
+    result = []
+    for offers in pages:
+        path = extractor.path_for(offers[0]) if offers else None
+        result.extend(extractor.extract(offer, path) for offer in offers)
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pages", nargs="*", help="fișiere JSON înregistrate (răspunsuri api/v1/offers)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    pages = recorded_pages(args.pages) if args.pages else synthetic_pages()
+    total = sum(len(offers) for offers in pages)
+    if not total:
+        sys.exit("Nicio ofertă în paginile date")
+
+    # Rezultatele trebuie să fie identice; altfel benchmark-ul nu are sens
+    scan, fast = run_scan(pages), run_extractor(pages)
+    mismatches = sum(a != b for a, b in zip(scan, fast))
+
+    t_scan = min(timeit.repeat(lambda: run_scan(pages), number=1, repeat=args.repeat))
+    t_fast = min(timeit.repeat(lambda: run_extractor(pages), number=1, repeat=args.repeat))
+
+    print(f"{len(pages)} pagini, {total} anunțuri")
+    print(f"  find_date_in_offer: {t_scan * 1e6 / total:8.2f} µs/anunț")
+    print(f"  DateExtractor:      {t_fast * 1e6 / total:8.2f} µs/anunț")
+    print(f"  speedup:            {t_scan / t_fast:8.1f}x")
+    print(f"  rezultate diferite: {mismatches}")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""Microbenchmark: decodarea unei pagini api/v1/offers.
+
+Compară vechiul drum (response.text + json.loads + dicționare) cu decode_page()
+din bytes + proiecția în Offer: timp per pagină și memorie maximă (tracemalloc).
+
+    python -m bench.offers
+    python -m bench.offers pagina1.json ...
+"""
+import argparse, json, sys, time, tracemalloc
+from pathlib import Path
+
+from bench.dates import synthetic_pages
+from olx.dates import DateExtractor, find_date_in_offer
+from olx.offers import JSON_BACKEND, decode_page, project
+
+def old_path(body: bytes):
+    data = json.loads(body.decode("utf-8"))
+    items = []
+    for offer in data.get("data", []):
+        items.append({
+            "id": str(offer.get("id")),
+            "title": offer.get("title", "").strip(),
+            "price": offer["price"]["value"]["display"] if offer.get("price") and offer["price"].get("value") else None,
+            "link": offer.get("url"),
+            "created_time": find_date_in_offer(offer),
+        })
+    return items
+
+def new_path(body: bytes, dates: DateExtractor):
+    raw_offers, _ = decode_page(body)
+    path = dates.path_for(raw_offers[0]) if raw_offers else None
+    return [project(raw, dates, path) for raw in raw_offers]
+
+def measure(fn, bodies):
+    """(secunde per pagină, memorie maximă în KB) pentru decodarea fiecărei pagini."""
+    start = time.perf_counter()
+    for body in bodies:
+        fn(body)
+    elapsed = (time.perf_counter() - start) / len(bodies)
+
+    tracemalloc.start()
+    for body in bodies:
+        fn(body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1024
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pages", nargs="*", help="fișiere JSON înregistrate (răspunsuri api/v1/offers)")
+    args = parser.parse_args(argv)
+
+    if args.pages:
+        bodies = [Path(p).read_bytes() for p in args.pages]
+    else:
+        bodies = [json.dumps({"data": offers, "links": {}}).encode() for offers in synthetic_pages(pages=10)]
+
+    dates = DateExtractor()
+    t_old, m_old = measure(old_path, bodies)
+    t_new, m_new = measure(lambda body: new_path(body, dates), bodies)
+
+    print(f"{len(bodies)} pagini, {sum(map(len, bodies)) / len(bodies) / 1024:.0f} KB/pagină, backend JSON: {JSON_BACKEND}")
+    print(f"  json.loads(text) + dict: {t_old * 1e3:7.2f} ms/pagină, memorie maximă {m_old:8.0f} KB")
+    print(f"  decode_page + Offer:     {t_new * 1e3:7.2f} ms/pagină, memorie maximă {m_new:8.0f} KB")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""Benchmark end-to-end offline: WatchJsonSpider + TelegramPipeline pe stub-uri locale.
+
+Pornește stub-urile OLX și Telegram (bench/stubs.py), rulează `scrapy crawl watch`
+(sau `python -m olx.poll`) într-un proces separat, cu un state.db nou, și raportează per ciclu: durata,
+paginile cerute, anunțurile parsate pe secundă, memoria maximă (RSS) și timpul
+de la publicarea anunțului în stub până la livrarea lui în stub-ul Telegram.
+
+    python -m bench.run
+    python -m bench.run --searches 5 --offers 80 --cycles 3 --new-per-cycle 5
+    python -m bench.run --date-shape mixed --olx-429-every 7 --telegram-429-every 10
+    python -m bench.run --engine poll                  # același scenariu cu olx.poll (fără Scrapy)
+    python -m bench.run --subscribers 200              # 200 de chat-uri abonate la căutări suprapuse
+"""
+import argparse, json, os, statistics, subprocess, sys, tempfile, time
+from pathlib import Path
+
+from bench.stubs import DATE_SHAPES, OlxStub, TelegramStub
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Comanda unui ciclu, pentru fiecare motor
+ENGINES = {
+    "scrapy": lambda log_level: [sys.executable, "-m", "scrapy", "crawl", "watch", "-s", f"LOG_LEVEL={log_level}"],
+    "poll": lambda log_level: [sys.executable, "-m", "olx.poll", "--log-level", log_level],
+}
+
+def bench_env(olx, telegram, queries, chat_rate) -> dict:
+    """Mediul procesului de crawl: stub-urile locale în loc de OLX / Telegram, câte o căutare per query."""
+    env = {k: v for k, v in os.environ.items() if not k.startswith("SEARCH_URL")}
+    env.update({
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")])),
+        "SCRAPY_SETTINGS_MODULE": "olx.settings",
+        "OLX_API_BASE": f"{olx.base_url}/api/v1/offers/",
+        "TELEGRAM_API_BASE": telegram.base_url,
+        "TELEGRAM_BOT_TOKEN": "bench",
+        "TELEGRAM_CHAT_ID": "1",
+        "TELEGRAM_CHAT_RATE": str(chat_rate),
+    })
+    env.update({f"SEARCH_URL_{q.upper()}": f"https://www.olx.ro/oferte/q-{q}/" for q in queries})
+    return env
+
+def write_subscriptions(workdir: Path, queries, subscribers: int):
+    """searches.json cu `subscribers` chat-uri, fiecare abonat la două căutări vecine (suprapuse)."""
+    urls = [f"https://www.olx.ro/oferte/q-{q}/" for q in queries]
+    subscriptions = {
+        str(1000 + i): sorted({urls[i % len(urls)], urls[(i + 1) % len(urls)]}) for i in range(subscribers)
+    }
+    (workdir / "searches.json").write_text(json.dumps({"subscriptions": subscriptions}), encoding="utf-8")
+
+def run_cycle(workdir: Path, env: dict, log_level: str, engine="scrapy"):
+    """Rulează un ciclu (`scrapy crawl watch` sau `python -m olx.poll`); întoarce (durata în secunde, RSS maxim în MB, exit code).
+
+    Log-ul procesului e adăugat în <workdir>/crawl.log.
+    """
+    start = time.perf_counter()
+    with open(workdir / "crawl.log", "ab") as log:
+        proc = subprocess.Popen(
+            ENGINES[engine](log_level),
+            cwd=workdir,
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    return elapsed, usage.ru_maxrss / 1024, os.waitstatus_to_exitcode(status)
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--searches", type=int, default=5, help="câte căutări (SEARCH_URL_BENCH1..N)")
+    parser.add_argument("--offers", type=int, default=80, help="anunțuri existente per căutare la primul ciclu")
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--new-per-cycle", type=int, default=3, help="anunțuri noi publicate înaintea fiecărui ciclu următor")
+    parser.add_argument("--shared", type=int, default=0, help="anunțuri noi per ciclu găsite de toate căutările (deduplicare)")
+    parser.add_argument("--pages", type=int, default=2, help="lungimea lanțului links.next în stub")
+    parser.add_argument("--date-shape", choices=DATE_SHAPES + ("mixed",), default="iso")
+    parser.add_argument("--olx-429-every", type=int, default=0, help="al N-lea request OLX primește 429 (0 = niciodată)")
+    parser.add_argument("--telegram-429-every", type=int, default=0, help="al N-lea apel Telegram primește 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after întors de stub-ul Telegram")
+    parser.add_argument("--subscribers", type=int, default=0, help="chat-uri abonate (searches.json cu abonamente)")
+    parser.add_argument("--chat-rate", type=float, default=30.0, help="TELEGRAM_CHAT_RATE folosit în benchmark")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="scrapy", help="scrapy crawl watch sau olx.poll")
+    parser.add_argument("--log-level", default="INFO")
+    parser.add_argument("--keep", metavar="DIR", help="folosește DIR ca director de lucru (păstrează state.db și crawl.log)")
+    args = parser.parse_args(argv)
+
+    olx = OlxStub(pages=args.pages, date_shape=args.date_shape, rate_limit_every=args.olx_429_every).start()
+    telegram = TelegramStub(rate_limit_every=args.telegram_429_every, retry_after=args.retry_after).start()
+    queries = [f"bench{i}" for i in range(1, args.searches + 1)]
+    for query in queries:
+        olx.publish(query, args.offers, backdate=True)
+
+    env = bench_env(olx, telegram, queries, args.chat_rate)
+
+    latencies, counted = [], set()
+    print(f"{'ciclu':>5} {'durată':>8} {'pagini':>7} {'anunțuri/s':>11} {'RSS MB':>7} {'livrate':>8} {'lag p50':>8} {'lag p95':>8} {'mesaje':>7}")
+    with tempfile.TemporaryDirectory(prefix="olx-bench-") as tmp:
+        workdir = Path(args.keep or tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        if args.subscribers:
+            write_subscriptions(workdir, queries, args.subscribers)
+        for cycle in range(1, args.cycles + 1):
+            if cycle > 1:
+                for query in queries:
+                    olx.publish(query, args.new_per_cycle)
+                if args.shared:
+                    olx.publish(queries[0], args.shared, also=queries[1:])
+
+            pages_before, offers_before, messages_before = olx.pages_served, olx.offers_served, len(telegram.messages)
+            elapsed, rss, code = run_cycle(workdir, env, args.log_level, args.engine)
+            pages = olx.pages_served - pages_before
+            offers = olx.offers_served - offers_before
+
+            cycle_lag = []
+            for offer_id, delivered in telegram.delivered_ids():
+                if offer_id in counted or offer_id not in olx.published:
+                    continue
+                counted.add(offer_id)
+                cycle_lag.append(delivered - olx.published[offer_id])
+            latencies.extend(cycle_lag)
+
+            print(
+                f"{cycle:>5} {elapsed:>7.2f}s {pages:>7} {offers / elapsed:>11.0f} {rss:>7.1f} "
+                f"{len(cycle_lag):>8} {percentile(cycle_lag, 50):>7.2f}s {percentile(cycle_lag, 95):>7.2f}s "
+                f"{len(telegram.messages) - messages_before:>7}"
+                + (f"  (exit {code}, vezi {workdir / 'crawl.log'})" if code else "")
+            )
+
+    print(
+        f"\nTotal: {olx.requests} requesturi OLX ({olx.rate_limited} cu 429), "
+        f"{len(telegram.messages)} apeluri Telegram ({telegram.edits} editări, {telegram.rate_limited} cu 429), "
+        f"lag publicare→livrare p50 {percentile(latencies, 50):.2f}s / p95 {percentile(latencies, 95):.2f}s / "
+        f"max {max(latencies, default=float('nan')):.2f}s"
+    )
+    olx.stop()
+    telegram.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
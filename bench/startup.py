@@ -0,0 +1,77 @@
+"""Benchmark: costul fix al unui tick de cron, `scrapy crawl watch` vs. `python -m olx.poll`.
+
+Pe stub-urile locale (bench/stubs.py), fiecare motor rulează întâi un ciclu de
+încălzire (istoricul inițial în propriul state.db), apoi `--runs` tickuri fără
+anunțuri noi — cazul obișnuit la cron, în care aproape tot timpul e pornirea.
+Se raportează și timpul de import al modulelor de pornire (`python -X importtime`).
+
+    python -m bench.startup
+    python -m bench.startup --runs 10 --searches 5
+"""
+import argparse, re, statistics, subprocess, sys, tempfile
+from pathlib import Path
+
+from bench.run import ENGINES, bench_env, run_cycle
+from bench.stubs import OlxStub, TelegramStub
+
+# Modulele importate la pornire de fiecare motor, înainte de primul request
+ENTRY_MODULES = {
+    "scrapy": "scrapy.cmdline, scrapy.crawler, olx.spiders.watch, pipelines",
+    "poll": "olx.poll, pipelines",
+}
+
+def import_time(modules: str, env: dict) -> float:
+    """Timpul cumulat de import (secunde) raportat de `python -X importtime` pentru `modules`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modules}"],
+        env=env, capture_output=True, text=True,
+    )
+    total = 0
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"; nivelul de top nu e indentat
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\S.*)$", line)
+        if match:
+            total += int(match.group(1))
+    return total / 1e6
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--searches", type=int, default=5)
+    parser.add_argument("--offers", type=int, default=40, help="anunțuri existente per căutare (ciclul de încălzire)")
+    parser.add_argument("--runs", type=int, default=5, help="tickuri măsurate per motor")
+    args = parser.parse_args(argv)
+
+    olx = OlxStub().start()
+    telegram = TelegramStub().start()
+    queries = [f"bench{i}" for i in range(1, args.searches + 1)]
+    for query in queries:
+        olx.publish(query, args.offers, backdate=True)
+    env = bench_env(olx, telegram, queries, chat_rate=30.0)
+
+    print(f"{'motor':>7} {'import':>8} {'tick min':>9} {'tick p50':>9} {'tick max':>9} {'RSS MB':>7}")
+    with tempfile.TemporaryDirectory(prefix="olx-startup-") as tmp:
+        for engine in sorted(ENGINES):
+            workdir = Path(tmp) / engine
+            workdir.mkdir()
+            run_cycle(workdir, env, "WARNING", engine)  # Încălzire: istoricul și watermark-urile inițiale
+            ticks, rss = [], []
+            for _ in range(args.runs):
+                elapsed, peak, code = run_cycle(workdir, env, "WARNING", engine)
+                if code:
+                    print(f"{engine:>7}: exit {code}, vezi {workdir / 'crawl.log'}")
+                    break
+                ticks.append(elapsed)
+                rss.append(peak)
+            if not ticks:
+                continue
+            print(
+                f"{engine:>7} {import_time(ENTRY_MODULES[engine], env):>7.2f}s {min(ticks):>8.2f}s "
+                f"{statistics.median(ticks):>8.2f}s {max(ticks):>8.2f}s {max(rss):>7.1f}"
+            )
+
+    olx.stop()
+    telegram.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
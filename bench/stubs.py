@@ -0,0 +1,217 @@
+"""Servere HTTP locale care imită api/v1/offers (OLX) și Bot API-ul Telegram.
+
+Folosite de bench/run.py; pot fi pornite și separat:
+
+    python -m bench.stubs --offers 200 --pages 5
+"""
+import argparse, copy, json, re, threading, time, urllib.parse
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+TEMPLATE = Path(__file__).parent / "data" / "offer.json"
+DATE_SHAPES = ("iso", "epoch", "nested", "missing")
+OFFER_ID_RE = re.compile(r"-ID(\d+)\.html")
+
+class StubServer:
+    """Server HTTP pe un port liber, într-un thread separat."""
+
+    def __init__(self, handler):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.stub = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, ca serverele reale
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_params(self) -> dict:
+        parsed = urllib.parse.urlparse(self.path)
+        params = dict(urllib.parse.parse_qsl(parsed.query))
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            params.update(urllib.parse.parse_qsl(self.rfile.read(length).decode()))
+        return params
+
+class OlxHandler(_Handler):
+    def do_GET(self):
+        self.server.stub.handle_offers(self)
+
+class OlxStub(StubServer):
+    """api/v1/offers local: anunțuri sintetice (din șablonul înregistrat), paginare prin
+    `links.next`, filtrare `min_id`, diverse forme ale câmpului de dată și 429 injectate."""
+
+    def __init__(self, pages=2, date_shape="iso", rate_limit_every=0, spacing=timedelta(minutes=1)):
+        super().__init__(OlxHandler)
+        self.template = json.loads(TEMPLATE.read_text(encoding="utf-8"))
+        self.max_pages = pages
+        self.date_shape = date_shape
+        self.rate_limit_every = rate_limit_every
+        self.spacing = spacing
+        self.lock = threading.Lock()
+        self.feeds = {}          # query -> [anunțuri], cele mai noi primele
+        self.published = {}      # offer id -> momentul publicării (time.time())
+        self.next_id = self.template["id"]
+        self.requests = 0
+        self.pages_served = 0
+        self.offers_served = 0
+        self.rate_limited = 0
+
+    def make_offer(self, query: str, created: datetime, shape: str) -> dict:
+        self.next_id += 1
+        offer = copy.deepcopy(self.template)
+        offer["id"] = self.next_id
+        offer["title"] = f"{query} #{self.next_id}"
+        offer["url"] = f"https://www.olx.ro/d/oferta/{query.replace(' ', '-')}-ID{self.next_id}.html"
+        stamp = created.replace(microsecond=0).isoformat() + "+03:00"
+        if shape == "iso":
+            offer["created_time"] = offer["last_refresh_time"] = stamp
+        else:
+            for key in ("created_time", "last_refresh_time", "valid_to_time"):
+                offer.pop(key, None)
+            offer["user"].pop("created", None)
+            offer["user"].pop("last_seen", None)
+            if shape == "epoch":
+                offer["created_time"] = int(created.timestamp() * 1000)
+            elif shape == "nested":
+                offer["meta"] = {"dates": {"createdAt": stamp}}
+        return offer
+
+    def publish(self, query: str, count: int, backdate=False, also=()):
+        """Publică `count` anunțuri noi pentru o căutare (cu `backdate`, eșalonate în trecut).
+
+        Anunțurile apar și în rezultatele căutărilor din `also` (același anunț, mai multe căutări).
+        """
+        now = datetime.now()
+        with self.lock:
+            fresh = []
+            for i in range(count):
+                created = now - self.spacing * (count - 1 - i) if backdate else now
+                shape = self.date_shape if self.date_shape != "mixed" else DATE_SHAPES[self.next_id % 3]
+                offer = self.make_offer(query, created, shape)
+                self.published[str(offer["id"])] = time.time()
+                fresh.append(offer)
+            for q in (query, *also):
+                feed = self.feeds.setdefault(q, [])
+                feed[:0] = reversed(fresh)
+                feed.sort(key=lambda o: o["id"], reverse=True)
+
+    def handle_offers(self, handler):
+        params = handler.read_params()
+        with self.lock:
+            self.requests += 1
+            if self.rate_limit_every and self.requests % self.rate_limit_every == 0:
+                self.rate_limited += 1
+                handler.send_json(429, {"error": "Too Many Requests"}, {"Retry-After": "1"})
+                return
+
+            query = params.get("query", "")
+            offset = int(params.get("offset", 0))
+            limit = int(params.get("limit", 40))
+            feed = self.feeds.get(query, [])
+            if params.get("min_id", "").isdigit():
+                min_id = int(params["min_id"])
+                feed = [o for o in feed if o["id"] > min_id]
+            data = feed[offset:offset + limit]
+            self.pages_served += 1
+            self.offers_served += len(data)
+
+        links = {}
+        if offset + limit < len(feed) and (offset // limit) + 1 < self.max_pages:
+            next_params = {**params, "offset": offset + limit, "limit": limit}
+            links["next"] = {"href": f"{self.base_url}/api/v1/offers/?{urllib.parse.urlencode(next_params)}"}
+        handler.send_json(200, {"data": data, "links": links, "metadata": {"total_elements": len(feed)}})
+
+class TelegramHandler(_Handler):
+    def do_GET(self):
+        self.server.stub.handle_bot(self)
+
+    do_POST = do_GET
+
+class TelegramStub(StubServer):
+    """Bot API local: înregistrează mesajele primite și poate simula 429 cu `retry_after`."""
+
+    def __init__(self, rate_limit_every=0, retry_after=1):
+        super().__init__(TelegramHandler)
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.rate_limited = 0
+        self.messages = []  # (momentul primirii, chat_id, text, metoda Bot API)
+
+    def handle_bot(self, handler):
+        params = handler.read_params()
+        method = handler.path.split("?")[0].rsplit("/", 1)[-1]
+        with self.lock:
+            self.calls += 1
+            if self.rate_limit_every and self.calls % self.rate_limit_every == 0:
+                self.rate_limited += 1
+                handler.send_json(429, {
+                    "ok": False, "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                })
+                return
+            self.messages.append((time.time(), params.get("chat_id"), params.get("text", ""), method))
+            message_id = len(self.messages)
+        handler.send_json(200, {"ok": True, "result": {"message_id": message_id}})
+
+    @property
+    def edits(self) -> int:
+        with self.lock:
+            return sum(1 for m in self.messages if m[3] == "editMessageText")
+
+    def delivered_ids(self):
+        """(offer id, momentul livrării) pentru fiecare anunț apărut într-un mesaj."""
+        with self.lock:
+            messages = list(self.messages)
+        for received, _, text, _ in messages:
+            for offer_id in OFFER_ID_RE.findall(text):
+                yield offer_id, received
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pornește stub-urile OLX și Telegram")
+    parser.add_argument("--offers", type=int, default=100, help="anunțuri publicate pentru query-ul 'bench'")
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--date-shape", choices=DATE_SHAPES + ("mixed",), default="iso")
+    args = parser.parse_args(argv)
+
+    olx = OlxStub(pages=args.pages, date_shape=args.date_shape).start()
+    telegram = TelegramStub().start()
+    olx.publish("bench", args.offers, backdate=True)
+    print(f"OLX_API_BASE={olx.base_url}/api/v1/offers/")
+    print(f"TELEGRAM_API_BASE={telegram.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import os, re, urllib.parse
+
+# Configurabil pentru benchmark-uri / teste cu un server local (vezi bench/)
+API_BASE = os.getenv("OLX_API_BASE", "https://www.olx.ro/api/v1/offers/")
+
+# Header-ele trimise către api/v1/offers (spider-ul Scrapy și olx.poll)
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36"
+    ),
+    "Accept": "application/json",
+}
+
+def get_category_from_url(url: str) -> str:
+    """Extrage categoria din URL (canon, nikon, sony, aparat_foto, camera_foto)"""
+    url_lower = url.lower()
+    if "canon" in url_lower:
+        return "canon"
+    elif "nikon" in url_lower:
+        return "nikon"
+    elif "sony" in url_lower:
+        return "sony"
+    elif "aparat%20foto" in url_lower or "aparat-foto" in url_lower or "aparat foto" in url_lower:
+        return "aparat_foto"
+    elif "camera%20foto" in url_lower or "camera-foto" in url_lower or "camera foto" in url_lower:
+        return "camera_foto"
+    else:
+        return "unknown"
+
+def build_api_url(src: str, offset=0, limit=40, min_id=None, newest_first=False) -> str:
+    """Transformă un URL OLX de căutare într-un apel API JSON corect (query=…).
+
+    Cu `min_id` (watermark-ul căutării) API-ul întoarce doar anunțuri mai noi,
+    sortate descrescător după data creării; `newest_first` cere aceeași sortare
+    și fără watermark (paginile cerute simultan trebuie să fie consecutive).
+    """
+    parsed = urllib.parse.urlparse(src)
+    params = urllib.parse.parse_qs(parsed.query)
+
+    # Dacă keyword-ul e în path ( /q-ps%20vita/ ), extragem și suprascriem
+    m = re.search(r"/q-([^/]+)/", parsed.path)
+    if m:
+        params["query"] = [urllib.parse.unquote_plus(m.group(1))]
+
+    # API-ul nu recunoaște vechiul „q", doar „query"
+    if "q" in params and "query" not in params:
+        params["query"] = params.pop("q")
+
+    # Watermark: doar anunțuri cu ID mai mare decât ultimul procesat, cele mai noi primele
+    if min_id is not None:
+        current = params.get("min_id", ["0"])[0]
+        params["min_id"] = [str(max(int(min_id), int(current) if current.isdigit() else 0))]
+    if min_id is not None or newest_first:
+        if "sort_by" not in params:
+            params["sort_by"] = params.pop("search[order]", ["created_at:desc"])
+
+    # Paginare
+    params["offset"] = [str(offset)]
+    params["limit"]  = [str(limit)]
+
+    # Construim URL final
+    query = urllib.parse.urlencode({k: v[0] for k, v in params.items()})
+    return f"{API_BASE}?{query}"
+
+def search_key(src: str) -> str:
+    """Cheie stabilă pentru o căutare: URL-ul API normalizat, fără paginare și watermark."""
+    parsed = urllib.parse.urlparse(build_api_url(src))
+    params = sorted(
+        (k, v) for k, v in urllib.parse.parse_qsl(parsed.query)
+        if k not in ("offset", "limit", "min_id")
+    )
+    return f"{API_BASE}?{urllib.parse.urlencode(params)}"
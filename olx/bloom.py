@@ -0,0 +1,139 @@
+"""Al doilea nivel de deduplicare: un filtru Bloom rotativ pentru ID-urile văzute.
+
+Setul exact din state.db acoperă doar ultimele 7 zile (max 1000 per căutare);
+filtrul ține minte ID-urile pe 30–90 de zile într-o memorie fixă (câteva sute de KB),
+cu o rată de fals pozitive configurabilă. Orizontul e împărțit în felii de timp:
+anunțurile noi intră în felia curentă, iar cea mai veche e aruncată la rotație.
+"""
+import hashlib, math, os, time
+
+DAY = 86400
+HORIZON_DAYS = 60     # Cât timp ține minte filtrul un ID
+SLICES = 6            # Felii de timp (la rotație se pierde 1/SLICES din orizont)
+CAPACITY = 150_000    # ID-uri așteptate pe tot orizontul (toate căutările)
+FP_RATE = 0.001       # Rata țintă de fals pozitive (anunț nou considerat văzut)
+
+class BloomSlice:
+    """Un filtru Bloom simplu: `size` biți, setați pentru ID-urile din intervalul lui de timp."""
+
+    __slots__ = ("start", "bits", "dirty")
+
+    def __init__(self, start: float, size: int, bits=None):
+        self.start = start
+        self.bits = bytearray(bits) if bits is not None else bytearray((size + 7) // 8)
+        self.dirty = False  # Un bit s-a schimbat de la ultima salvare
+
+    def add(self, positions) -> bool:
+        """Setează biții; True dacă vreunul nu era deja setat."""
+        changed = False
+        for p in positions:
+            mask = 1 << (p & 7)
+            if not self.bits[p >> 3] & mask:
+                self.bits[p >> 3] |= mask
+                changed = True
+        self.dirty |= changed
+        return changed
+
+    def __contains__(self, positions) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def union(self, other: "BloomSlice"):
+        """OR cu biții altei felii de aceeași mărime (salvată de alt proces)."""
+        merged = int.from_bytes(self.bits, "little") | int.from_bytes(other.bits, "little")
+        self.bits = bytearray(merged.to_bytes(len(self.bits), "little"))
+        self.start = min(self.start, other.start)
+
+    def fill_ratio(self, size: int) -> float:
+        return int.from_bytes(self.bits, "little").bit_count() / size
+
+class RotatingBloom:
+    """Filtru Bloom împărțit în SLICES felii de timp; un ID e „văzut” dacă apare în oricare felie.
+
+    Fiecare felie e dimensionată pentru CAPACITY / SLICES ID-uri la o rată de FP_RATE / SLICES,
+    astfel încât rata totală (reuniunea feliilor) rămâne sub FP_RATE.
+    """
+
+    def __init__(self, horizon_days=HORIZON_DAYS, capacity=CAPACITY, fp_rate=FP_RATE, slices=SLICES):
+        self.horizon = horizon_days * DAY
+        self.slice_span = self.horizon / slices
+        self.slice_count = slices
+        self.fp_rate = fp_rate
+        per_slice = max(1, capacity // slices)
+        target = fp_rate / slices
+        self.size = max(64, math.ceil(-per_slice * math.log(target) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / per_slice * math.log(2)))
+        self.slices = []
+        self.rotated = False  # Felii adăugate / aruncate de la ultima salvare
+
+    @classmethod
+    def from_env(cls):
+        """Parametrii din SEEN_FILTER_DAYS / SEEN_FILTER_CAPACITY / SEEN_FILTER_FP."""
+        return cls(
+            float(os.getenv("SEEN_FILTER_DAYS", HORIZON_DAYS)),
+            int(os.getenv("SEEN_FILTER_CAPACITY", CAPACITY)),
+            float(os.getenv("SEEN_FILTER_FP", FP_RATE)),
+        )
+
+    def positions(self, key: str):
+        """Pozițiile celor `hashes` biți (double hashing pe un singur blake2b)."""
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def rotate(self, now: float):
+        """Deschide o felie nouă dacă cea curentă și-a depășit intervalul; aruncă feliile expirate."""
+        if self.slices and now - self.slices[-1].start < self.slice_span:
+            return
+        self.slices.append(BloomSlice(now, self.size))
+        self.slices = [s for s in self.slices if now - s.start < self.horizon][-self.slice_count:]
+        self.rotated = True
+
+    def add(self, key: str, uid: str, now=None) -> bool:
+        """Adaugă un ID în felia curentă; True dacă filtrul s-a schimbat (trebuie salvat)."""
+        self.rotate(time.time() if now is None else now)
+        return self.slices[-1].add(self.positions(f"{key}:{uid}"))
+
+    def contains(self, key: str, uid: str) -> bool:
+        positions = self.positions(f"{key}:{uid}")
+        return any(positions in s for s in self.slices)
+
+    def merge(self, others):
+        """Unește feliile salvate între timp de alt proces care folosește același state.db.
+
+        O felie e unită (OR) cu felia noastră cea mai apropiată în timp; una mai nouă decât
+        toate ale noastre (celălalt proces a rotit între timp) e păstrată ca felie separată,
+        iar una mai veche decât toate a fost deja aruncată de noi la rotație.
+        """
+        half = self.slice_span / 2
+        for other in others:
+            if not self.slices or other.start > self.slices[-1].start + half:
+                self.slices.append(other)
+                continue
+            nearest = min(self.slices, key=lambda s: abs(s.start - other.start))
+            if abs(nearest.start - other.start) < half or other.start > nearest.start:
+                nearest.union(other)
+        self.slices = sorted(self.slices, key=lambda s: s.start)[-self.slice_count:]
+
+    def estimated_fp_rate(self) -> float:
+        """Rata de fals pozitive estimată din gradul de umplere al fiecărei felii."""
+        miss = 1.0
+        for s in self.slices:
+            miss *= 1 - s.fill_ratio(self.size) ** self.hashes
+        return 1 - miss
+
+    @property
+    def dirty(self) -> bool:
+        return self.rotated or any(s.dirty for s in self.slices)
+
+    def mark_clean(self):
+        self.rotated = False
+        for s in self.slices:
+            s.dirty = False
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(s.bits) for s in self.slices)
+
+    def __len__(self):
+        return len(self.slices)
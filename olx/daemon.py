@@ -0,0 +1,39 @@
+"""Rulare continuă: python -m olx.daemon
+
+Procesul rămâne pornit, istoricul stă în memorie, iar fiecare căutare e reluată pe
+propriul interval, adaptat după câte anunțuri noi apar (vezi olx.scheduler).
+"""
+import argparse, os
+
+from olx.scheduler import MAX_INTERVAL, MIN_INTERVAL
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OLX Telegram Alert - mod daemon")
+    parser.add_argument("--searches", help="fișier JSON cu căutările (implicit searches.json / SEARCH_URL_*)")
+    parser.add_argument("--min-interval", type=float, default=MIN_INTERVAL, help="secunde între polluri, minim")
+    parser.add_argument("--max-interval", type=float, default=MAX_INTERVAL, help="secunde între polluri, maxim")
+    parser.add_argument("--metrics-port", type=int, help="expune metricile Prometheus pe http://0.0.0.0:PORT/metrics")
+    parser.add_argument("--metrics-textfile", help="scrie metricile Prometheus în acest fișier (textfile collector)")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("SCRAPY_SETTINGS_MODULE", "olx.settings")
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    settings = get_project_settings()
+    settings.set("LOG_LEVEL", args.log_level)
+    process = CrawlerProcess(settings)
+    process.crawl(
+        "watch",
+        searches=args.searches,
+        daemon=True,
+        min_interval=args.min_interval,
+        max_interval=args.max_interval,
+        metrics_port=args.metrics_port,
+        metrics_textfile=args.metrics_textfile,
+    )
+    process.start()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+from datetime import datetime
+
+def try_parse_date(value):
+    """Încearcă să parseze o valoare ca dată/timestamp"""
+    if value is None:
+        return None
+    
+    try:
+        # Timestamp numeric (milisecunde sau secunde)
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value / 1000 if value > 1e10 else value)
+        
+        # String ISO format
+        if isinstance(value, str):
+            # Elimină timezone info pentru parsing
+            clean_value = value.split("+")[0].split("Z")[0].split(".")[0]
+            
+            # Formate comune
+            formats = [
+                "%Y-%m-%dT%H:%M:%S",
+                "%Y-%m-%dT%H:%M:%S.%f",
+                "%Y-%m-%d %H:%M:%S",
+                "%Y-%m-%d %H:%M:%S.%f",
+                "%Y-%m-%d",
+                "%d/%m/%Y %H:%M:%S",
+                "%d-%m-%Y %H:%M:%S",
+            ]
+            
+            for fmt in formats:
+                try:
+                    return datetime.strptime(clean_value, fmt)
+                except ValueError:
+                    continue
+    except Exception:
+        pass
+    
+    return None
+
+# Listă de câmpuri posibile (case-insensitive)
+DATE_KEYWORDS = ("created", "date", "published", "timestamp", "time", "refresh", "updated")
+
+def _find_date(offer, depth, max_depth, path=()):
+    """Ca find_date_in_offer, dar întoarce și calea cheii: (data, ("created_time",))."""
+    if depth > max_depth or not isinstance(offer, dict):
+        return None, None
+    
+    # Caută direct în cheile din offer
+    for key, value in offer.items():
+        if value is None:
+            continue
+            
+        key_lower = str(key).lower()
+        
+        # Verifică dacă cheia conține un keyword de dată
+        if any(keyword in key_lower for keyword in DATE_KEYWORDS):
+            parsed_date = try_parse_date(value)
+            if parsed_date:
+                return parsed_date, path + (key,)
+        
+        # Dacă valoarea e un dicționar, caută recursiv
+        if isinstance(value, dict):
+            nested = _find_date(value, depth + 1, max_depth, path + (key,))
+            if nested[0]:
+                return nested
+        
+        # Dacă valoarea e o listă de dicționare, caută în ele
+        elif isinstance(value, list) and len(value) > 0 and isinstance(value[0], dict):
+            for i, item in enumerate(value[:2]):  # Verifică doar primele 2 elemente
+                nested = _find_date(item, depth + 1, max_depth, path + (key, i))
+                if nested[0]:
+                    return nested
+    
+    return None, None
+
+def find_date_in_offer(offer, depth=0, max_depth=3):
+    """Caută recursiv data în offer și sub-obiecte (case-insensitive)"""
+    return _find_date(offer, depth, max_depth)[0]
+
+def parse_date_fast(value):
+    """Calea rapidă: ISO 8601 prin fromisoformat, sau epoch (secunde / milisecunde).
+
+    Rezultatul e la fel ca la try_parse_date: fără timezone și fără fracțiuni de secundă.
+    """
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).replace(tzinfo=None, microsecond=0)
+        except ValueError:
+            return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            return datetime.fromtimestamp(value / 1000 if value > 1e10 else value)
+        except (OverflowError, OSError, ValueError):
+            return None
+    return None
+
+def value_at(offer, path):
+    """Valoarea de la calea `path` (ex. ("created_time",)) dintr-un anunț, sau None."""
+    value = offer
+    for step in path or ():
+        try:
+            value = value[step]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return value
+
+def epoch_at(offer, path):
+    """Epoch-ul datei de la `path`, cu fusul orar din API (pentru latențe); None dacă e ambiguu.
+
+    Spre deosebire de parse_date_fast, offset-ul (+03:00) e păstrat; un șir fără fus orar
+    ar fi interpretat în ora locală a mașinii, deci nu e folosit.
+    """
+    value = value_at(offer, path) if path else None
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+        return parsed.timestamp() if parsed.tzinfo is not None else None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value / 1000 if value > 1e10 else float(value)
+    return None
+
+class DateExtractor:
+    """Extrage data publicării folosind calea învățată pentru schema API-ului.
+
+    Calea (ex. ("created_time",)) e găsită o singură dată, cu scanarea generică, pe primul
+    anunț dintr-un răspuns și memorată per schemă (lista de chei a anunțului). Pentru
+    celelalte anunțuri se citește direct valoarea; scanarea completă rulează doar dacă
+    valoarea lipsește sau nu poate fi parsată.
+    """
+
+    def __init__(self, max_depth=3):
+        self.max_depth = max_depth
+        self.paths = {}
+        self.fast_hits = 0
+        self.fallbacks = 0
+
+    def path_for(self, offer):
+        """Calea datei pentru schema acestui anunț (învățată la prima întâlnire)."""
+        if not isinstance(offer, dict):
+            return None
+        schema = tuple(offer)
+        if schema not in self.paths:
+            self.paths[schema] = _find_date(offer, 0, self.max_depth)[1]
+        return self.paths[schema]
+
+    def extract(self, offer, path=None):
+        """Data publicării pentru un anunț; `path` vine de la path_for() pe primul anunț din pagină."""
+        if path is None:
+            path = self.path_for(offer)
+
+        if path:
+            value = value_at(offer, path)
+            if value is not None:
+                parsed_date = parse_date_fast(value) or try_parse_date(value)
+                if parsed_date:
+                    self.fast_hits += 1
+                    return parsed_date
+
+        self.fallbacks += 1
+        return find_date_in_offer(offer, 0, self.max_depth)
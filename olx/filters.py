@@ -0,0 +1,68 @@
+import re, unicodedata
+
+def fold(text: str) -> str:
+    """Text pentru potrivirea cuvintelor cheie: litere mici, fără diacritice (ș → s, ă → a)."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+def compile_keywords(keywords):
+    """Un singur regex pentru toate cuvintele cheie (None dacă lista e goală).
+
+    Potrivirea e la început de cuvânt: "piese" prinde și "piesele", dar nu "campiese".
+    """
+    words = sorted({fold(k).strip() for k in keywords if k and k.strip()}, key=len, reverse=True)
+    if not words:
+        return None
+    return re.compile(r"\b(?:" + "|".join(re.escape(w) for w in words) + ")")
+
+class AlertFilter:
+    """Filtrul declarativ al unui abonament (căutare, chat): interval de preț și cuvinte cheie incluse / excluse.
+
+    Configurare (în searches.json, cheia "filter" a unei căutări / a unui abonament):
+      {"min_price": 500, "max_price": 3000, "currency": "RON",
+       "include": ["eos", "body"], "exclude": ["defect", "piese"]}
+    Cuvintele cheie sunt compilate o singură dată și căutate în titlu și descriere.
+    """
+
+    __slots__ = ("min_price", "max_price", "currency", "include", "exclude", "signature")
+
+    def __init__(self, min_price=None, max_price=None, currency=None, include=(), exclude=()):
+        self.min_price = float(min_price) if min_price is not None else None
+        self.max_price = float(max_price) if max_price is not None else None
+        self.currency = currency.upper() if currency else None
+        self.include = compile_keywords(include)
+        self.exclude = compile_keywords(exclude)
+        # Același filtru repetat pentru un chat și un URL e păstrat o singură dată (Search.subscribe)
+        self.signature = (self.min_price, self.max_price, self.currency,
+                          self.include.pattern if self.include else None,
+                          self.exclude.pattern if self.exclude else None)
+
+    @classmethod
+    def from_config(cls, config):
+        """AlertFilter din dicționarul de configurare; None dacă nu e definit niciun criteriu."""
+        if not config:
+            return None
+        return cls(
+            config.get("min_price"), config.get("max_price"), config.get("currency"),
+            config.get("include") or (), config.get("exclude") or (),
+        )
+
+    def reject_reason(self, offer, description="") -> str:
+        """Motivul respingerii ("price", "exclude", "include") sau None dacă anunțul trece."""
+        price = offer.price_value
+        if price is not None and (self.currency is None or offer.currency is None or offer.currency == self.currency):
+            if self.min_price is not None and price < self.min_price:
+                return "price"
+            if self.max_price is not None and price > self.max_price:
+                return "price"
+        if self.exclude is None and self.include is None:
+            return None
+        text = fold(f"{offer.title}\n{description or ''}")
+        if self.exclude is not None and self.exclude.search(text):
+            return "exclude"
+        if self.include is not None and not self.include.search(text):
+            return "include"
+        return None
+
+    def __repr__(self):
+        return f"AlertFilter(price={self.min_price}..{self.max_price} {self.currency or ''})"
@@ -0,0 +1,254 @@
+"""Metrici pentru crawl și notificări: contoare, gauge-uri și histograme.
+
+Valorile sunt oglindite în stats-urile Scrapy (apar în „Dumping Scrapy stats” la final)
+și pot fi exportate în format Prometheus: fișier text pentru node_exporter
+(METRICS_TEXTFILE) sau endpoint HTTP /metrics (METRICS_PORT).
+"""
+import bisect, os, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (0, 1, 5, 10, 20, 40, 80)
+LAG_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 4 * 3600)
+
+# nume -> (tip, descriere, bucket-uri pentru histograme)
+DEFINITIONS = {
+    "olx_fetch_seconds": ("histogram", "Latența download-ului unei pagini api/v1/offers", LATENCY_BUCKETS),
+    "olx_parse_seconds": ("histogram", "Timpul de parsare al unei pagini", LATENCY_BUCKETS),
+    "olx_offers_per_page": ("histogram", "Anunțuri procesate per pagină", COUNT_BUCKETS),
+    "olx_pages_per_cycle": ("histogram", "Pagini cerute într-un ciclu al unei căutări", (1, 2, 3, 5, 10)),
+    "olx_page_size": ("histogram", "Mărimea paginii (limit) cerute la începutul unui ciclu", (10, 20, 30, 40, 50)),
+    "olx_pages_cancelled_total": ("counter", "Pagini cerute simultan, anulate după atingerea anunțurilor știute", None),
+    "olx_page_cache_total": ("counter", "Prima pagină a unui poll: neschimbată (hit: 304 / același digest) sau nouă (miss)", None),
+    "olx_page_cache_hit_ratio": ("gauge", "Fracțiunea pollurilor încheiate fără parsare (prima pagină neschimbată)", None),
+    "olx_stop_total": ("counter", "Motivul opririi paginării", None),
+    "olx_responses_total": ("counter", "Răspunsuri api/v1/offers după status", None),
+    "olx_new_offers_total": ("counter", "Anunțuri noi trimise spre notificare", None),
+    "olx_filtered_total": ("counter", "Alerte netrimise unui chat, respinse de filtrul abonamentului lui (preț, cuvinte cheie)", None),
+    "olx_price_drops_total": ("counter", "Anunțuri deja văzute al căror preț a scăzut", None),
+    "olx_reposts_total": ("counter", "Anunțuri republicate (aceeași amprentă) ignorate, fără scădere de preț", None),
+    "olx_seen_filter_hits_total": ("counter", "Anunțuri recunoscute doar de filtrul Bloom (în afara istoricului exact)", None),
+    "olx_seen_filter_fp_ratio": ("gauge", "Rata estimată de fals pozitive a filtrului Bloom", None),
+    "olx_seen_filter_bytes": ("gauge", "Memoria ocupată de feliile filtrului Bloom", None),
+    "olx_offers_without_date_total": ("counter", "Anunțuri fără dată de publicare", None),
+    "telegram_send_seconds": ("histogram", "Durata unui apel sendMessage", LATENCY_BUCKETS),
+    "telegram_queue_depth": ("gauge", "Mesaje în coada de trimitere", None),
+    "telegram_sent_total": ("counter", "Apeluri Telegram reușite (sendMessage / editMessageText)", None),
+    "alerts_merged_total": ("counter", "Anunțuri găsite și de altă căutare: etichetă nouă, fără mesaj nou", None),
+    "telegram_rate_limited_total": ("counter", "Răspunsuri 429 de la Telegram", None),
+    "telegram_retries_total": ("counter", "Reîncercări după erori temporare (5xx, rețea)", None),
+    "telegram_digests_total": ("counter", "Digest-uri trimise în locul mai multor mesaje individuale", None),
+    "telegram_coalesced_total": ("counter", "Anunțuri trimise în digest-uri", None),
+    "telegram_dropped_total": ("counter", "Mesaje abandonate (4xx permanent)", None),
+    "alert_lag_seconds": ("histogram", "De la publicarea anunțului (created_time) până la livrare", LAG_BUCKETS),
+}
+
+class Histogram:
+    """Histogramă cu bucket-uri fixe (cumulative la export, ca în Prometheus)."""
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # ultimul = +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def copy(self) -> "Histogram":
+        other = Histogram(self.buckets)
+        other.counts = list(self.counts)
+        other.count = self.count
+        other.sum = self.sum
+        return other
+
+    def merge(self, other: "Histogram"):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q: float) -> float:
+        """Estimare din bucket-uri (interpolare liniară), ca histogram_quantile()."""
+        if not self.count:
+            return float("nan")
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+def _format_labels(labels: tuple, extra=()) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+class Metrics:
+    """Registrul de metrici al unei rulări; sigur de folosit și din thread-ul Telegram."""
+
+    def __init__(self, stats=None):
+        self.stats = stats  # StatsCollector-ul Scrapy (opțional)
+        self._lock = threading.Lock()
+        self._values = {}  # (nume, etichete) -> float sau Histogram
+        self._server = None
+
+    def inc(self, name: str, value=1, **labels):
+        with self._lock:
+            key = (name, _labels(labels))
+            self._values[key] = self._values.get(key, 0) + value
+            if self.stats is not None:
+                self.stats.inc_value(self._stats_key(name, labels), value)
+
+    def set(self, name: str, value, **labels):
+        with self._lock:
+            self._values[(name, _labels(labels))] = value
+            if self.stats is not None:
+                self.stats.set_value(self._stats_key(name, labels), value)
+                self.stats.max_value(self._stats_key(name + "_max", labels), value)
+
+    def observe(self, name: str, value: float, **labels):
+        with self._lock:
+            key = (name, _labels(labels))
+            hist = self._values.get(key)
+            if hist is None:
+                hist = self._values[key] = Histogram(DEFINITIONS.get(name, (None, None, LATENCY_BUCKETS))[2])
+            hist.observe(value)
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        """Histograma cu etichetele date sau, fără etichete, toate seriile combinate."""
+        with self._lock:
+            if labels:
+                hist = self._values.get((name, _labels(labels)))
+                return hist.copy() if hist is not None else None
+            merged = None
+            for (n, _), hist in self._values.items():
+                if n != name:
+                    continue
+                if merged is None:
+                    merged = Histogram(hist.buckets)
+                merged.merge(hist)
+            return merged
+
+    @staticmethod
+    def _stats_key(name: str, labels: dict) -> str:
+        return "/".join([name, *(str(v) for v in labels.values())])
+
+    def export_stats(self):
+        """Sumarul histogramelor (count, medie, p50, p95) în stats-urile Scrapy."""
+        if self.stats is None:
+            return
+        with self._lock:
+            items = [(k, v.copy()) for k, v in self._values.items() if isinstance(v, Histogram)]
+        for (name, labels), hist in items:
+            base = self._stats_key(name, dict(labels))
+            self.stats.set_value(f"{base}/count", hist.count)
+            if hist.count:
+                self.stats.set_value(f"{base}/avg", round(hist.sum / hist.count, 4))
+                self.stats.set_value(f"{base}/p50", round(hist.quantile(0.5), 4))
+                self.stats.set_value(f"{base}/p95", round(hist.quantile(0.95), 4))
+
+    def render(self) -> str:
+        """Toate metricile în formatul text Prometheus."""
+        with self._lock:
+            snapshot = sorted(
+                ((k, v.copy() if isinstance(v, Histogram) else v) for k, v in self._values.items()),
+                key=lambda kv: kv[0],
+            )
+
+        lines, declared = [], set()
+        for (name, labels), value in snapshot:
+            if name not in declared:
+                kind, description, _ = DEFINITIONS.get(name, ("untyped", "", None))
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} {kind}")
+                declared.add(name)
+            if isinstance(value, Histogram):
+                cumulative = 0
+                for bound, n in zip((*value.buckets, "+Inf"), value.counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {value.sum:g}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value.count}")
+            else:
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """Scrie metricile atomic (fișier temporar + rename), pentru textfile collector-ul node_exporter."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+    def serve(self, port: int, host: str = "0.0.0.0"):
+        """Pornește endpoint-ul HTTP /metrics pe un thread separat."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server.server_address[1]
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+class LogSampler:
+    """Limitează mesajele de log repetate: primele `burst` apariții ale unei chei sunt
+    logate, apoi cel mult una la `interval` secunde, cu numărul celor suprimate între timp."""
+
+    def __init__(self, burst=3, interval=60.0):
+        self.burst = burst
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._state = {}  # cheie -> [apariții, suprimate, ultima logare]
+
+    def allow(self, key):
+        """(True, suprimate de la ultima logare) dacă mesajul trebuie logat, altfel (False, 0)."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._state.get(key)
+            if state is None:
+                state = self._state[key] = [0, 0, 0.0]
+            state[0] += 1
+            if state[0] <= self.burst or now - state[2] >= self.interval:
+                suppressed, state[1], state[2] = state[1], 0, now
+                return True, suppressed
+            state[1] += 1
+            return False, 0
+
+    def log(self, logger, level: str, key, message):
+        """Loghează `message` (string sau funcție care îl construiește) dacă cheia nu e limitată."""
+        allowed, suppressed = self.allow(key)
+        if not allowed:
+            return
+        text = message() if callable(message) else message
+        if suppressed:
+            text += f" (+{suppressed} similare suprimate)"
+        getattr(logger, level)(text)
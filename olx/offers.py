@@ -0,0 +1,111 @@
+import hashlib, json, re
+from dataclasses import dataclass
+from datetime import datetime
+
+from olx.dates import epoch_at
+from olx.filters import fold
+
+try:  # Backend JSON mai rapid, dacă e instalat (pip install orjson)
+    import orjson
+    loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    loads = json.loads  # json.loads acceptă direct bytes (UTF-8)
+    JSON_BACKEND = "json"
+
+@dataclass(slots=True)
+class Offer:
+    """Un anunț OLX, redus la câmpurile folosite de alerte."""
+
+    id: str
+    title: str
+    url: str
+    price: str = None
+    price_value: float = None  # Prețul numeric, pentru filtre (None dacă lipsește / e „Schimb”)
+    currency: str = None
+    created_time: datetime = None
+    created_epoch: float = None  # Epoch-ul publicării, cu fusul orar din API (latența alertelor)
+    category: str = None
+    search: str = None
+    numeric_id: int = None
+    promoted: bool = False
+    fingerprint: int = None  # Hash titlu normalizat + vânzător (detectarea republicărilor)
+    previous_price: float = None  # Alertă de scădere a prețului: prețul anterior
+    relisted: bool = False  # Anunț republicat (ID nou, aceeași amprentă) cu preț mai mic
+    original: str = None  # Republicare: ID-ul anunțului anterior (chat-urile care l-au primit nu îl mai primesc)
+    description: str = None  # Doar pentru filtrele abonaților (cuvinte cheie), completată la anunțurile noi
+
+def decode_page(body: bytes):
+    """Parsează direct bytes-ii răspunsului api/v1/offers: (anunțuri brute, URL pagina următoare)."""
+    data = loads(body)
+    if not isinstance(data, dict):
+        raise ValueError(f"Răspuns neașteptat: {type(data).__name__}")
+
+    next_link = (data.get("links") or {}).get("next")
+    # Extrage URL-ul dacă next_link e dicționar
+    if isinstance(next_link, dict):
+        next_url = next_link.get("href") or next_link.get("url") or next_link.get("link")
+    else:
+        next_url = next_link
+    return data.get("data") or [], next_url
+
+def price_fields(raw: dict):
+    """(preț afișat, valoare numerică, monedă): price.value sau, în formatul actual, parametrul "price"."""
+    price = raw.get("price")
+    if isinstance(price, dict) and isinstance(price.get("value"), dict):
+        value = price["value"]
+        display = value.get("display")
+    else:
+        value = next(
+            (param.get("value") or {} for param in raw.get("params") or ()
+             if isinstance(param, dict) and param.get("key") == "price"),
+            None,
+        )
+        if not isinstance(value, dict):
+            return None, None, None
+        display = value.get("label") or value.get("display")
+    amount = value.get("value")
+    amount = float(amount) if isinstance(amount, (int, float)) and not isinstance(amount, bool) else None
+    return display, amount, value.get("currency")
+
+def page_digest(raw_offers) -> str:
+    """Digest ieftin al listei ordonate de ID-uri a unei pagini (fără proiecția anunțurilor)."""
+    ids = "\n".join(str(raw.get("id")) if isinstance(raw, dict) else "" for raw in raw_offers)
+    return hashlib.blake2b(ids.encode(), digest_size=16).hexdigest()
+
+def fingerprint(title: str, seller) -> int:
+    """Amprenta unui anunț: titlul normalizat și vânzătorul, ca întreg pe 64 de biți (încape în SQLite)."""
+    words = re.findall(r"\w+", fold(title))
+    digest = hashlib.blake2b(f"{seller}|{' '.join(words)}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+def project(raw: dict, dates, date_path=None):
+    """Construiește un Offer din anunțul brut; None dacă lipsesc ID-ul, titlul sau URL-ul."""
+    if not isinstance(raw, dict):
+        return None
+    uid = raw.get("id")
+    title = (raw.get("title") or "").strip()
+    url = raw.get("url")
+    if uid is None or not title or not url:
+        return None
+
+    uid = str(uid)
+    promotion = raw.get("promotion")
+    price, price_value, currency = price_fields(raw)
+    user = raw.get("user")
+    seller = user.get("id") if isinstance(user, dict) else None
+    return Offer(
+        id=uid,
+        title=title,
+        url=url,
+        price=price,
+        price_value=price_value,
+        currency=currency,
+        created_time=dates.extract(raw, date_path),
+        # Latența se măsoară de la publicare (created_time), nu de la reîmprospătare (last_refresh_time)
+        created_epoch=epoch_at(raw, ("created_time",)) or epoch_at(raw, date_path or dates.path_for(raw)),
+        numeric_id=int(uid) if uid.isdigit() else None,
+        promoted=bool(isinstance(promotion, dict) and promotion.get("top_ad")),
+        # Fără vânzător, titlul singur ar uni anunțuri diferite: nu calculăm amprenta
+        fingerprint=fingerprint(title, seller) if seller is not None else None,
+    )
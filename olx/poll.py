@@ -0,0 +1,151 @@
+"""Rulare rapidă pentru cron, fără Scrapy: python -m olx.poll
+
+Un singur ciclu pentru toate căutările, cu aceeași logică de paginare și watermark
+(olx.watcher) și același pipeline Telegram ca `scrapy crawl watch`, dar fără costul
+de pornire al Scrapy și Twisted. Requesturile OLX pleacă din asyncio, pe o sesiune
+HTTP cu pool de conexiuni; retry-urile și 429 se comportă ca în custom_settings-ul
+spider-ului.
+"""
+import argparse, asyncio, logging, random, time
+import requests
+
+from olx.api import HEADERS
+from olx.scheduler import CATCHUP_PAGES
+from olx.watcher import Watcher
+
+# Aceleași valori ca în WatchJsonSpider.custom_settings (și valorile implicite Scrapy)
+DOWNLOAD_DELAY = 1.0
+DOWNLOAD_TIMEOUT = 180
+RETRY_TIMES = 3
+RETRY_HTTP_CODES = {500, 502, 503, 504, 408, 429}
+# Ca HTTPERROR_ALLOWED_CODES: 304 = prima pagină neschimbată; după retry-uri, 429 ajunge la parsare (ciclu eșuat)
+ALLOWED_CODES = {304, 429}
+
+class Response:
+    """O pagină descărcată, cu atributele folosite de Watcher.parse_page."""
+
+    __slots__ = ("url", "status", "body", "headers")
+
+    def __init__(self, url, status, body, headers=None):
+        self.url = url
+        self.status = status
+        self.body = body
+        self.headers = headers if headers is not None else {}
+
+class RequestFailed(Exception):
+    """Request eșuat definitiv (eroare de rețea sau status neacceptat, după retry-uri)."""
+
+class Poller(Watcher):
+    def __init__(self, searches=None, metrics_textfile=None, logger=None):
+        self.logger = logger or logging.getLogger("watch")
+        self.setup(searches, metrics_textfile=metrics_textfile)
+        self.session = None
+        self.slots = {}  # download slot -> momentul (monotonic) de la care poate pleca următorul request
+
+    def open_session(self):
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        # O conexiune persistentă per request simultan (toate căutările, fan-out inclus)
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(10, len(self.searches) * CATCHUP_PAGES))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    async def wait_slot(self, slot: str):
+        """DOWNLOAD_DELAY între requesturile aceluiași slot, randomizat 0.5x–1.5x ca în Scrapy."""
+        now = time.monotonic()
+        ready = self.slots.get(slot, now)
+        self.slots[slot] = max(now, ready) + DOWNLOAD_DELAY * random.uniform(0.5, 1.5)
+        if ready > now:
+            await asyncio.sleep(ready - now)
+
+    async def fetch(self, search, slot: str, url: str, headers=None) -> Response:
+        """GET cu retry: până la RETRY_TIMES reîncercări pentru RETRY_HTTP_CODES și erori de rețea."""
+        for attempt in range(RETRY_TIMES + 1):
+            await self.wait_slot(slot)
+            start = time.perf_counter()
+            try:
+                response = await asyncio.to_thread(self.session.get, url, headers=headers, timeout=DOWNLOAD_TIMEOUT)
+            except requests.RequestException as e:
+                if attempt == RETRY_TIMES:
+                    raise RequestFailed(repr(e)) from e
+                continue
+            self.metrics.observe("olx_fetch_seconds", time.perf_counter() - start, search=search.name)
+            if response.status_code in RETRY_HTTP_CODES and attempt < RETRY_TIMES:
+                continue
+            if 200 <= response.status_code < 300 or response.status_code in ALLOWED_CODES:
+                return Response(url, response.status_code, response.content, response.headers)
+            raise RequestFailed(f"HTTP {response.status_code}")
+
+    def process(self, search, response: Response):
+        self.metrics.inc("olx_responses_total", search=search.name, status=response.status)
+        # Timpul de parsare exclude pipeline-ul, ca în spider
+        parse_time = 0.0
+        results = self.parse_page(search, response)
+        while True:
+            start = time.perf_counter()
+            offer = next(results, None)
+            parse_time += time.perf_counter() - start
+            if offer is None:
+                break
+            self.pipeline.process_item(offer, self)
+        self.metrics.observe("olx_parse_seconds", parse_time, search=search.name)
+
+    async def run_search(self, search):
+        """Un ciclu al unei căutări: paginile în ordine; la fan-out, cele rămase sunt anulate la oprire."""
+        pages = self.start_cycle(search)
+        slot = lambda page: search.name if search.fan_out == 1 else f"{search.name}#{page}"
+        tasks = {
+            page: asyncio.create_task(self.fetch(search, slot(page), url, self.conditional_headers(search, page, url)))
+            for page, url in pages
+        }
+        page = 1
+        try:
+            while page in tasks:
+                try:
+                    response = await tasks.pop(page)
+                except RequestFailed as e:
+                    self.log_sampler.log(self.logger, "warning", ("request_error", search.name), f"[{search.name}] Request eșuat: {e}")
+                    search.failed = True
+                    search.stop_reason = "request_error"
+                    break
+                self.process(search, response)
+                if search.stop_reason is not None:
+                    break
+                page += 1
+                if search.fan_out == 1:
+                    tasks[page] = asyncio.create_task(self.fetch(search, slot(page), search.next_url))
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            if tasks:
+                self.metrics.inc("olx_pages_cancelled_total", len(tasks), search=search.name)
+        self.end_cycle(search)
+
+    async def run(self):
+        from pipelines import TelegramPipeline
+
+        self.open_session()
+        self.pipeline = TelegramPipeline()
+        self.pipeline.open_spider(self)
+        try:
+            await asyncio.gather(*(self.run_search(search) for search in self.searches))
+        finally:
+            self.session.close()
+            self.pipeline.close(self)
+            self.log_summary()
+            if self.metrics_textfile:
+                self.write_metrics()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OLX Telegram Alert - un ciclu rapid, fără Scrapy (pentru cron)")
+    parser.add_argument("--searches", help="fișier JSON cu căutările (implicit searches.json / SEARCH_URL_*)")
+    parser.add_argument("--metrics-textfile", help="scrie metricile Prometheus în acest fișier (textfile collector)")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+
+    # Același format de log ca Scrapy
+    logging.basicConfig(level=args.log_level, format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
+    asyncio.run(Poller(args.searches, args.metrics_textfile).run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import math, random
+
+MIN_INTERVAL = 60       # Căutările aglomerate: cel mult o dată pe minut
+MAX_INTERVAL = 30 * 60  # Căutările liniștite: cel puțin o dată la 30 de minute
+TARGET_NEW = 1.0        # Câte anunțuri noi vrem să găsim, în medie, la un poll
+ALPHA = 0.3             # Ponderea ultimei observații în EWMA
+JITTER = 0.15           # ±15% ca pollurile să nu se sincronizeze
+
+MIN_PAGE_SIZE = 10      # Pollurile obișnuite: o pagină mică
+MAX_PAGE_SIZE = 50      # Maximul acceptat de api/v1/offers
+PAGE_MARGIN = 2.0       # Pagina cuprinde de 2x mai multe anunțuri decât cele noi așteptate
+CATCHUP_PAGES = 5       # Recuperare: câte pagini cerem simultan (max 250 anunțuri)
+REVALIDATE_INTERVAL = 3600  # O dată pe oră, prima pagină e cerută fără watermark (schimbări de preț)
+
+class PollSchedule:
+    """Intervalul de polling al unei căutări, adaptat după rata de anunțuri noi.
+
+    Rata (anunțuri noi / secundă) e o medie exponențială (EWMA) a observațiilor;
+    intervalul e timpul în care ar apărea în medie TARGET_NEW anunțuri noi, limitat
+    la [min_interval, max_interval]. La 429 / 5xx intervalul se dublează la fiecare
+    eșec consecutiv (backoff exponențial).
+    """
+
+    def __init__(self, rate=None, last_poll=None, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL,
+                 target_new=TARGET_NEW, alpha=ALPHA, jitter=JITTER, revalidated=None):
+        self.rate = rate
+        self.last_poll = last_poll
+        self.revalidated = revalidated  # Ultimul poll fără watermark
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_new = target_new
+        self.alpha = alpha
+        self.jitter = jitter
+        self.failures = 0
+
+    def record(self, new_count: int, now: float):
+        """Înregistrează un ciclu reușit cu `new_count` anunțuri noi."""
+        if self.last_poll is not None and now > self.last_poll:
+            sample = new_count / (now - self.last_poll)
+            self.rate = sample if self.rate is None else self.alpha * sample + (1 - self.alpha) * self.rate
+        self.last_poll = now
+        self.failures = 0
+
+    def record_failure(self):
+        """Înregistrează un ciclu eșuat (429, 5xx, eroare de rețea)."""
+        self.failures += 1
+
+    @property
+    def interval(self) -> float:
+        """Intervalul de bază, fără jitter și fără backoff."""
+        if self.rate is None:
+            return self.min_interval
+        if self.rate <= 0:
+            return self.max_interval
+        return min(self.max_interval, max(self.min_interval, self.target_new / self.rate))
+
+    def expected_new(self, now: float):
+        """Câte anunțuri noi ne așteptăm să găsim acum (None fără istoric)."""
+        if self.rate is None or self.last_poll is None:
+            return None
+        return self.rate * max(0.0, now - self.last_poll)
+
+    def page_plan(self, now: float):
+        """(mărimea paginii, câte pagini cerem simultan) pentru pollul de acum.
+
+        Pollurile obișnuite cer o singură pagină, dimensionată după anunțurile noi
+        așteptate. Prima rulare (fără istoric) sau o pauză lungă pe o căutare
+        aglomerată trec în modul de recuperare: pagini mari, cerute simultan.
+        """
+        expected = self.expected_new(now)
+        if expected is None:
+            # Al doilea poll (încă fără rată): o pagină întreagă, paginarea continuă dacă e nevoie
+            return (MAX_PAGE_SIZE, CATCHUP_PAGES) if self.last_poll is None else (MAX_PAGE_SIZE, 1)
+        wanted = expected * PAGE_MARGIN
+        if wanted <= MAX_PAGE_SIZE:
+            return max(MIN_PAGE_SIZE, math.ceil(wanted)), 1
+        return MAX_PAGE_SIZE, min(CATCHUP_PAGES, math.ceil(wanted / MAX_PAGE_SIZE))
+
+    def revalidation_due(self, now: float) -> bool:
+        """True dacă a trecut REVALIDATE_INTERVAL de la ultima reverificare (sau nu a existat niciuna)."""
+        return self.revalidated is None or now - self.revalidated >= REVALIDATE_INTERVAL
+
+    def next_delay(self) -> float:
+        """Secunde până la următorul poll: interval (cu backoff după eșecuri) ± jitter."""
+        delay = self.interval
+        if self.failures:
+            delay = min(self.max_interval, max(delay, self.min_interval) * 2 ** self.failures)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
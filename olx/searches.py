@@ -0,0 +1,169 @@
+import os, json
+from pathlib import Path
+
+from olx.api import get_category_from_url, search_key
+from olx.filters import AlertFilter
+
+SEARCHES_FILE = "searches.json"
+
+class Search:
+    """O căutare OLX monitorizată, cu paginarea și contoarele ei proprii."""
+
+    def __init__(self, name: str, url: str, category: str = None, chats=(), filter=None):
+        self.name = name
+        self.url = url
+        self.category = category or get_category_from_url(url)
+        self.key = search_key(url)
+        # Chat-urile abonate (load_searches completează chat-urile implicite din TELEGRAM_CHAT_ID)
+        self.chats = [str(chat) for chat in chats]
+        self.filter = filter  # Filtrul abonamentului din configurare (load_searches îl atașează chat-urilor lui)
+        # Filtrele per abonat: chat → AlertFilter-ele abonamentelor lui (un chat absent primește tot)
+        self.filters = {chat: [filter] for chat in self.chats} if filter is not None else {}
+        # Watermark: cel mai mare ID și cea mai nouă dată procesate (persistate în state.db)
+        self.watermark_id = None
+        self.watermark_time = None
+        # Prima pagină din ultimul ciclu complet: (URL, ETag, Last-Modified, digest ID-uri), pentru cereri condiționale
+        self.page_cache = None
+        self.schedule = None  # PollSchedule, folosit în modul daemon și pentru rata de anunțuri noi
+        self.cycle = 0  # Numărul ciclului curent: răspunsurile dintr-un ciclu anterior sunt ignorate
+        self.reset()
+
+    def reset(self):
+        """Resetăm contoarele la începutul fiecărui ciclu de căutare"""
+        self.page_count = 0
+        self.consecutive_seen = 0
+        self.failed = False  # O pagină a eșuat: nu avansăm watermark-ul
+        self.stop_reason = None  # De ce s-a oprit paginarea (pentru metrici)
+        self.new_count = 0
+        self.max_id = self.watermark_id
+        self.max_created = self.watermark_time
+        self.cycle += 1
+        self.done = False  # Ciclul s-a încheiat: paginile încă pe drum sunt anulate
+        # Paginarea ciclului: mărimea paginii, câte pagini sunt cerute simultan, limita de pagini
+        self.page_size = 40
+        self.fan_out = 1
+        self.max_pages = 2
+        self.buffered = {}  # Fan-out: pagini sosite înaintea celor anterioare (număr pagină -> răspuns)
+        self.next_url = None  # Pagina următoare, dacă paginarea continuă
+        self.revalidating = False  # Ciclu de reverificare a prețurilor (fără watermark)
+        self.next_page_cache = None  # Validatorii primei pagini din ciclul curent (salvați dacă ciclul reușește)
+
+    def subscribe(self, chat: str, filter=None):
+        """Abonează un chat; cu filtru primește doar anunțurile acceptate de vreunul din filtrele lui."""
+        if chat not in self.chats:
+            self.chats.append(chat)
+            if filter is not None:
+                self.filters[chat] = [filter]
+        elif chat in self.filters:
+            if filter is None:
+                del self.filters[chat]  # Un abonament fără filtru le acoperă pe celelalte
+            elif all(f.signature != filter.signature for f in self.filters[chat]):
+                self.filters[chat].append(filter)
+
+    def observe(self, offer_id: int, created=None):
+        """Actualizează maximele ciclului curent cu un anunț procesat."""
+        if self.max_id is None or offer_id > self.max_id:
+            self.max_id = offer_id
+        if created is not None and (self.max_created is None or created > self.max_created):
+            self.max_created = created
+
+    def is_below_watermark(self, offer_id: int) -> bool:
+        """True dacă anunțul a fost deja acoperit de un ciclu anterior."""
+        return self.watermark_id is not None and offer_id <= self.watermark_id
+
+    def advance_watermark(self) -> bool:
+        """Mută watermark-ul la maximele ciclului; True dacă s-a schimbat."""
+        changed = (self.max_id, self.max_created) != (self.watermark_id, self.watermark_time)
+        self.watermark_id = self.max_id
+        self.watermark_time = self.max_created
+        return changed
+
+    def __repr__(self):
+        return f"Search({self.name!r}, category={self.category!r})"
+
+def searches_from_file(path) -> list:
+    """Citește căutările dintr-un fișier JSON.
+
+    Formate acceptate:
+      [{"name": "canon", "url": "https://...", "category": "canon", "chats": ["123", "456"],
+        "filter": {"max_price": 3000, "exclude": ["defect", "piese"]}}, ...]
+      {"canon": "https://...", "nikon": "https://..."}
+      {"subscriptions": {"123": ["https://...", {"name": "canon", "url": "https://..."}], "456": [...]}}
+    """
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    if isinstance(data, dict) and isinstance(data.get("subscriptions"), dict):
+        # Registrul de abonamente: chat → căutări (inversat în load_searches: căutare → chat-uri)
+        data = [
+            {**(entry if isinstance(entry, dict) else {"url": entry}), "chats": [chat]}
+            for chat, entries in data["subscriptions"].items()
+            for entry in entries
+        ]
+    elif isinstance(data, dict):
+        data = [{"name": name, "url": url} for name, url in data.items()]
+
+    searches = []
+    for entry in data:
+        if isinstance(entry, str):
+            entry = {"url": entry}
+        url = entry.get("url")
+        if not url:
+            continue
+        category = entry.get("category")
+        name = entry.get("name") or category or get_category_from_url(url)
+        searches.append(Search(name, url, category, entry.get("chats") or (), AlertFilter.from_config(entry.get("filter"))))
+    return searches
+
+def searches_from_env(environ=None) -> list:
+    """Construiește căutările din SEARCH_URL și SEARCH_URL_<CATEGORIE>.
+
+    Fiecare variabilă poate conține unul sau mai multe URL-uri separate prin virgulă.
+    Categoria se deduce din sufixul variabilei (SEARCH_URL_APARAT_FOTO → aparat_foto).
+    """
+    environ = os.environ if environ is None else environ
+    searches = []
+    for var in sorted(environ):
+        if var == "SEARCH_URL":
+            category = None
+        elif var.startswith("SEARCH_URL_"):
+            category = var[len("SEARCH_URL_"):].lower()
+        else:
+            continue
+
+        urls = [u.strip() for u in environ[var].split(",") if u.strip()]
+        for i, url in enumerate(urls):
+            search_category = category or get_category_from_url(url)
+            name = search_category if i == 0 else f"{search_category}_{i + 1}"
+            searches.append(Search(name, url, search_category))
+    return searches
+
+def default_chats(environ=None) -> list:
+    """Chat-urile din TELEGRAM_CHAT_ID (unul sau mai multe, separate prin virgulă)."""
+    environ = os.environ if environ is None else environ
+    return [chat.strip() for chat in environ.get("TELEGRAM_CHAT_ID", "").split(",") if chat.strip()]
+
+def load_searches(path=None) -> list:
+    """Încarcă lista de căutări: fișier de configurare (dacă există), altfel variabile de mediu."""
+    path = path or os.getenv("SEARCHES_FILE")
+    if path or Path(SEARCHES_FILE).exists():
+        searches = searches_from_file(path or SEARCHES_FILE)
+    else:
+        searches = searches_from_env()
+    # Index inversat: o căutare per URL API normalizat, cerută o singură dată per ciclu, cu reuniunea
+    # chat-urilor abonate și filtrul fiecărui abonament; numele care se repetă primesc un sufix
+    unique, by_key, names = [], {}, set()
+    for search in searches:
+        # Căutările fără abonați expliciți merg la chat-urile implicite
+        chats = search.chats or default_chats()
+        existing = by_key.get(search.key)
+        if existing is None:
+            existing = by_key[search.key] = search
+            search.chats, search.filters = [], {}
+            base, n = search.name, 2
+            while search.name in names:
+                search.name = f"{base}_{n}"
+                n += 1
+            names.add(search.name)
+            unique.append(search)
+        for chat in chats:
+            existing.subscribe(chat, search.filter)
+    return unique
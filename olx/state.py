@@ -0,0 +1,522 @@
+import json, os, sqlite3, threading, time
+from pathlib import Path
+from datetime import datetime, timedelta
+
+from olx.bloom import BloomSlice, RotatingBloom
+
+STATE_DB = Path("state.db")
+LEGACY_STATE_FILE = Path("state.json")
+MAX_AGE = timedelta(days=7)
+MAX_ENTRIES = 1000  # Maxim per categorie, aplicat la compactare
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen (
+    category TEXT NOT NULL,
+    id       TEXT NOT NULL,
+    ts       REAL NOT NULL,
+    PRIMARY KEY (category, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS seen_ts ON seen (ts);
+CREATE INDEX IF NOT EXISTS seen_id ON seen (id);
+CREATE TABLE IF NOT EXISTS outbox (
+    seq      INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id  TEXT,
+    text     TEXT NOT NULL,
+    item_id  TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created  REAL
+);
+CREATE TABLE IF NOT EXISTS watermarks (
+    search      TEXT PRIMARY KEY,
+    max_id      INTEGER NOT NULL,
+    max_created REAL
+);
+CREATE TABLE IF NOT EXISTS search_stats (
+    search    TEXT PRIMARY KEY,
+    rate      REAL,
+    last_poll REAL
+);
+CREATE TABLE IF NOT EXISTS page_cache (
+    search        TEXT PRIMARY KEY,
+    url           TEXT NOT NULL,
+    etag          TEXT,
+    last_modified TEXT,
+    digest        TEXT
+);
+CREATE TABLE IF NOT EXISTS alerts (
+    id         TEXT PRIMARY KEY,
+    searches   TEXT NOT NULL,
+    categories TEXT NOT NULL,
+    chat_id    TEXT,
+    message_id INTEGER,
+    ts         REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS alerts_ts ON alerts (ts);
+CREATE TABLE IF NOT EXISTS seen_filter (
+    slice  INTEGER PRIMARY KEY,
+    start  REAL NOT NULL,
+    size   INTEGER NOT NULL,
+    hashes INTEGER NOT NULL,
+    bits   BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Coloane adăugate după prima versiune a schemei: (tabel, coloană, definiție)
+COLUMNS = [
+    ("outbox", "created", "REAL"),
+    ("outbox", "method", "TEXT"),
+    ("outbox", "message_id", "INTEGER"),
+    ("alerts", "chats", "TEXT"),
+    ("seen", "price", "REAL"),
+    ("seen", "fp", "INTEGER"),
+    ("search_stats", "revalidated", "REAL"),
+]
+
+def to_epoch(timestamp) -> float:
+    """Convertește un timestamp ISO, datetime sau numeric în secunde epoch; fallback: acum."""
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    if isinstance(timestamp, datetime):
+        return timestamp.timestamp()
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+def connect(path) -> sqlite3.Connection:
+    """Conexiune SQLite în mod WAL, sigură pentru mai multe procese care scriu în paralel."""
+    conn = sqlite3.connect(str(path), timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+def legacy_entries(data) -> dict:
+    """Aduce cele trei formate istorice ale state.json la {categorie: [(id, epoch), ...]}.
+
+    Formate: listă simplă de ID-uri, listă de dicționare {id, timestamp},
+    dicționar pe categorii (cu oricare dintre cele două liste de mai sus).
+    """
+    if isinstance(data, list):
+        data = {"unknown": data}
+    elif not isinstance(data, dict):
+        return {}
+
+    now = time.time()
+    result = {}
+    for category, entries in data.items():
+        if category.startswith("_") or not isinstance(entries, list):
+            continue
+        rows = []
+        for item in entries:
+            if isinstance(item, str):
+                rows.append((item, now))
+            elif isinstance(item, dict) and "id" in item:
+                rows.append((str(item["id"]), to_epoch(item.get("timestamp"))))
+        result[category] = rows
+    return result
+
+class AlertRecord:
+    """Alerta trimisă pentru un anunț: căutările care l-au găsit și mesajul Telegram din fiecare chat."""
+
+    __slots__ = ("searches", "categories", "chats", "ts", "msgs")
+
+    def __init__(self, searches, categories, chats=None, ts=None):
+        self.searches = list(searches)
+        self.categories = list(categories)
+        self.chats = dict(chats or {})  # chat_id -> message_id (None până aflăm ID-ul de la Telegram)
+        self.ts = time.time() if ts is None else ts
+        self.msgs = {}  # chat_id -> OutboundMessage din rularea curentă (până aflăm message_id)
+
+    def resolved_message_id(self, chat_id):
+        """message_id-ul mesajului individual din chat (None dacă anunțul a plecat într-un digest)."""
+        message_id = self.chats.get(chat_id)
+        msg = self.msgs.get(chat_id)
+        if message_id is None and msg is not None and msg.parent is None:
+            return msg.message_id
+        return message_id
+
+    def resolved_chats(self) -> dict:
+        return {chat_id: self.resolved_message_id(chat_id) for chat_id in self.chats}
+
+class OfferIndex:
+    """Amprentele anunțurilor văzute, în memorie: prețul per ID și primul ID per amprentă.
+
+    Toate sunt lookup-uri O(1) per anunț; nu păstrăm și nu comparăm JSON-ul anunțurilor.
+    """
+
+    __slots__ = ("prices", "search_prices", "owners")
+
+    def __init__(self):
+        self.prices = {}  # id -> ultimul preț numeric văzut (de oricare căutare)
+        self.search_prices = {}  # id -> {cheie căutare: prețul văzut de acea căutare}
+        self.owners = {}  # amprentă -> ID-ul primului anunț cu amprenta asta
+
+    def add(self, key: str, uid: str, price=None, fp=None):
+        if price is not None:
+            self.prices[uid] = price
+            self.search_prices.setdefault(uid, {})[key] = price
+        if fp is not None:
+            self.owners.setdefault(fp, uid)
+
+    def seen_price(self, key: str, uid: str):
+        """Prețul anunțului la ultima vizită a căutării `key` (None dacă nu l-a văzut cu preț)."""
+        return self.search_prices.get(uid, {}).get(key)
+
+    def update_price(self, uid: str, price: float):
+        """Prețul nou, pentru toate căutările care au văzut anunțul (scăderea e anunțată o singură dată)."""
+        self.prices[uid] = price
+        keys = self.search_prices.get(uid, {})
+        for key in keys:
+            keys[key] = price
+
+    def original(self, uid: str, fp):
+        """ID-ul anunțului anterior cu aceeași amprentă (republicare), sau None."""
+        owner = self.owners.get(fp) if fp is not None else None
+        return owner if owner != uid else None
+
+class SeenStore:
+    """Istoricul anunțurilor văzute, într-o bază SQLite indexată.
+
+    Inserările și căutările sunt pe cheie primară (category, id), unde `category` e cheia
+    căutării (`Search.key`): fiecare căutare are propriul istoric, iar deduplicarea între
+    căutări o face indexul global de alerte (per chat). Expirarea se face
+    prin indexul pe `ts`, fără rescanarea întregului istoric. Căutările din spider
+    folosesc seturile din memorie încărcate o singură dată la pornire. În spatele
+    setului exact, `filter` (Bloom rotativ, salvat în state.db) ține minte ID-urile
+    expirate sau tăiate la compactare, pe un orizont de 30–90 de zile.
+    """
+
+    def __init__(self, path=STATE_DB, legacy_path=LEGACY_STATE_FILE, logger=None):
+        self.path = Path(path)
+        self.logger = logger
+        self.conn = connect(self.path)
+        self.conn.executescript(SCHEMA)
+        self.upgrade_schema()
+        self._compactor = None
+        self.migrate_legacy(Path(legacy_path))
+        # Filtrul salvat în state.db nu mai acoperă tot istoricul (până la următoarea salvare)
+        self._filter_stale = False
+        # Marcajul din meta al acestui proces: biți adăugați, încă nesalvați în seen_filter
+        self._filter_marker = f"seen_filter_pending:{os.getpid()}:{id(self)}"
+        self._filter_changes = 0
+        self._filter_covered = {}  # Marcajele altor procese acoperite de reconstruirea din `seen`
+        self.filter = self.load_filter(RotatingBloom.from_env())
+
+    def log(self, level, msg):
+        if self.logger:
+            getattr(self.logger, level)(msg)
+
+    def upgrade_schema(self):
+        """Adaugă coloanele noi într-un state.db creat de o versiune mai veche."""
+        for table, column, decl in COLUMNS:
+            existing = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+            if column not in existing:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+    def migrate_legacy(self, legacy_path: Path):
+        """Importă automat un state.json vechi (oricare format) la prima rulare."""
+        if not legacy_path.exists():
+            return
+        try:
+            data = json.loads(legacy_path.read_text())
+        except Exception as e:
+            self.log("warning", f"Eroare la încărcarea {legacy_path}: {e}")
+            return
+
+        entries = legacy_entries(data)
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            for category, rows in entries.items():
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO seen (category, id, ts) VALUES (?, ?, ?)",
+                    [(category, uid, ts) for uid, ts in rows],
+                )
+            for msg in data.get("_outbox", []) if isinstance(data, dict) else []:
+                self.conn.execute(
+                    "INSERT INTO outbox (chat_id, text, item_id, attempts) VALUES (?, ?, ?, ?)",
+                    (msg.get("chat_id"), msg["text"], msg.get("id"), msg.get("attempts", 0)),
+                )
+        legacy_path.rename(legacy_path.with_name(legacy_path.name + ".migrated"))
+        total = sum(len(rows) for rows in entries.values())
+        self.log("info", f"🔄 Migrat {legacy_path} în {self.path}: {total} anunțuri din {len(entries)} categorii")
+
+    def adopt_unknown(self, categories):
+        """Mută anunțurile din categoria "unknown" (format vechi) în categoriile active fără istoric."""
+        active = [c for c in dict.fromkeys(categories) if c != "unknown"]
+        unknown = self.conn.execute("SELECT COUNT(*) FROM seen WHERE category = 'unknown'").fetchone()[0]
+        if not unknown or not active:
+            return
+
+        self.log("info", f"🔄 Găsită categorie 'unknown' cu {unknown} anunțuri - migrare în progres...")
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            for category in active:
+                if self.conn.execute("SELECT 1 FROM seen WHERE category = ? LIMIT 1", (category,)).fetchone():
+                    continue
+                self.log("info", f"  → Mutăm anunțurile din 'unknown' la categoria '{category}'")
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO seen (category, id, ts) SELECT ?, id, ts FROM seen WHERE category = 'unknown'",
+                    (category,),
+                )
+            self.conn.execute("DELETE FROM seen WHERE category = 'unknown'")
+
+    def adopt_categories(self, searches):
+        """Istoricul vechi, păstrat per categorie, e copiat în istoricul fiecărei căutări din categoria lui."""
+        legacy = [
+            category for category in dict.fromkeys(s.category for s in searches)
+            if self.conn.execute("SELECT 1 FROM seen WHERE category = ? LIMIT 1", (category,)).fetchone()
+        ]
+        if not legacy:
+            return
+
+        self.log("info", f"🔄 Istoric per categorie ({', '.join(legacy)}) mutat pe căutări")
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            for search in searches:
+                if search.category not in legacy:
+                    continue
+                if self.conn.execute("SELECT 1 FROM seen WHERE category = ? LIMIT 1", (search.key,)).fetchone():
+                    continue
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO seen (category, id, ts, price, fp) "
+                    "SELECT ?, id, ts, price, fp FROM seen WHERE category = ?",
+                    (search.key, search.category),
+                )
+            self.conn.executemany("DELETE FROM seen WHERE category = ?", [(c,) for c in legacy])
+
+    def load_seen(self, key: str) -> set:
+        """ID-urile văzute (neexpirate) de o căutare, ca set pentru căutări O(1)."""
+        cutoff = time.time() - MAX_AGE.total_seconds()
+        rows = self.conn.execute("SELECT id FROM seen WHERE category = ? AND ts > ?", (key, cutoff))
+        return {uid for (uid,) in rows}
+
+    def add(self, key: str, uid: str, timestamp=None, price=None, fp=None):
+        """Adaugă un anunț în istoricul unei căutări (idempotent), cu prețul și amprenta lui."""
+        ts = time.time() if timestamp is None else to_epoch(timestamp)
+        self.conn.execute(
+            "INSERT OR IGNORE INTO seen (category, id, ts, price, fp) VALUES (?, ?, ?, ?, ?)",
+            (key, uid, ts, price, fp),
+        )
+        if self.filter.add(key, uid):
+            # Dacă procesul e oprit înainte de save_filter, rularea următoare îl completează din `seen`
+            self._filter_stale = True
+            self._filter_changes += 1
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (self._filter_marker, str(self._filter_changes))
+            )
+
+    def update_price(self, uid: str, price: float):
+        """Noul preț al unui anunț deja văzut (în toate categoriile care l-au găsit)."""
+        self.conn.execute("UPDATE seen SET price = ? WHERE id = ?", (price, uid))
+
+    def load_offer_index(self) -> OfferIndex:
+        """Indexul de amprente (neexpirat), în ordinea în care au fost văzute anunțurile."""
+        cutoff = time.time() - MAX_AGE.total_seconds()
+        index = OfferIndex()
+        rows = self.conn.execute(
+            "SELECT category, id, price, fp FROM seen WHERE ts > ? AND (price IS NOT NULL OR fp IS NOT NULL) ORDER BY ts",
+            (cutoff,),
+        )
+        for key, uid, price, fp in rows:
+            index.add(key, uid, price, fp)
+        return index
+
+    def load_filter(self, bloom: RotatingBloom) -> RotatingBloom:
+        """Filtrul Bloom salvat (dacă are aceiași parametri); reconstruit din `seen` doar dacă e incomplet."""
+        rows = self.conn.execute("SELECT start, size, hashes, bits FROM seen_filter ORDER BY slice").fetchall()
+        if rows and any((size, hashes) != (bloom.size, bloom.hashes) for _, size, hashes, _ in rows):
+            # SEEN_FILTER_* schimbate: pozițiile biților diferă, filtrul e reconstruit din `seen`
+            self.log("info", "🌸 Parametrii filtrului Bloom s-au schimbat, îl reconstruim din istoric")
+            rows = []
+        bloom.slices = [BloomSlice(start, size, bits) for start, size, hashes, bits in rows]
+        pending = self.filter_pending()
+        if not rows or pending:
+            # Filtru nou / reconstruit, sau un proces (oprit brusc sau încă pornit) nu și-a salvat
+            # filtrul: ID-urile din `seen` sunt readăugate (idempotent), iar filtrul e salvat la închidere
+            for key, uid in self.conn.execute("SELECT category, id FROM seen"):
+                bloom.add(key, uid)
+            self._filter_stale = True
+            self._filter_covered = pending
+        return bloom
+
+    def filter_pending(self) -> dict:
+        """Marcajele proceselor care au modificat filtrul fără să-l fi salvat încă."""
+        return dict(self.conn.execute("SELECT key, value FROM meta WHERE key LIKE 'seen_filter_pending:%'"))
+
+    def save_filter(self):
+        """Scrie feliile filtrului Bloom în state.db, doar dacă s-a schimbat (închidere, mentenanță daemon).
+
+        Alte procese pot să fi salvat între timp același state.db: feliile lor sunt citite și unite
+        cu ale noastre în aceeași tranzacție, ca niciun bit să nu se piardă.
+        """
+        if not self.filter.dirty and not self._filter_stale:
+            return
+        bloom = self.filter
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            stored = self.conn.execute("SELECT start, size, hashes, bits FROM seen_filter ORDER BY slice").fetchall()
+            bloom.merge([
+                BloomSlice(start, size, bits) for start, size, hashes, bits in stored
+                if (size, hashes) == (bloom.size, bloom.hashes)
+            ])
+            self.conn.execute("DELETE FROM seen_filter")
+            self.conn.executemany(
+                "INSERT INTO seen_filter (slice, start, size, hashes, bits) VALUES (?, ?, ?, ?, ?)",
+                [(i, s.start, bloom.size, bloom.hashes, bytes(s.bits)) for i, s in enumerate(bloom.slices)],
+            )
+            self.conn.execute("DELETE FROM meta WHERE key = ?", (self._filter_marker,))
+            # Reconstruit din `seen`: acoperă modificările altor procese până la încărcare; un marcaj
+            # schimbat de atunci (procesul încă adaugă) rămâne pentru rularea următoare
+            self.conn.executemany("DELETE FROM meta WHERE key = ? AND value = ?", self._filter_covered.items())
+        bloom.mark_clean()
+        self._filter_stale = False
+        self._filter_changes = 0
+        self._filter_covered = {}
+
+    def load_alerts(self) -> dict:
+        """Indexul global {id anunț: AlertRecord} (neexpirat), pentru deduplicarea între căutări."""
+        cutoff = time.time() - MAX_AGE.total_seconds()
+        rows = self.conn.execute(
+            "SELECT id, searches, categories, chat_id, message_id, chats, ts FROM alerts WHERE ts > ?", (cutoff,)
+        )
+        alerts = {}
+        for uid, searches, categories, chat_id, message_id, chats, ts in rows:
+            # Rândurile dinaintea abonamentelor au un singur chat, în coloanele chat_id / message_id
+            chats = json.loads(chats) if chats else ({chat_id: message_id} if chat_id is not None else {})
+            alerts[uid] = AlertRecord(json.loads(searches), json.loads(categories), chats, ts)
+        return alerts
+
+    def save_alert(self, uid: str, record: AlertRecord):
+        # Un singur rând per anunț, oricâte chat-uri l-au primit: {chat_id: message_id} în coloana chats
+        self.conn.execute(
+            "INSERT OR REPLACE INTO alerts (id, searches, categories, chats, ts) VALUES (?, ?, ?, ?, ?)",
+            (uid, json.dumps(record.searches), json.dumps(record.categories),
+             json.dumps(record.resolved_chats(), separators=(",", ":")), record.ts),
+        )
+
+    def save_message_ids(self, alerts: dict) -> int:
+        """Salvează message_id-urile aflate după trimitere (necesare pentru editări ulterioare)."""
+        updates = []
+        for uid, record in alerts.items():
+            resolved = record.resolved_chats()
+            if resolved != record.chats:
+                record.chats = resolved
+                updates.append((json.dumps(resolved, separators=(",", ":")), uid))
+        if updates:
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                self.conn.executemany("UPDATE alerts SET chats = ? WHERE id = ?", updates)
+        return len(updates)
+
+    def get_watermark(self, key: str):
+        """(max_id, max_created) pentru o căutare, sau (None, None) la prima rulare."""
+        row = self.conn.execute("SELECT max_id, max_created FROM watermarks WHERE search = ?", (key,)).fetchone()
+        return row if row else (None, None)
+
+    def set_watermark(self, key: str, max_id: int, max_created=None):
+        """Salvează watermark-ul unei căutări (nu coboară niciodată sub valoarea existentă)."""
+        self.conn.execute(
+            "INSERT INTO watermarks (search, max_id, max_created) VALUES (?, ?, ?) "
+            "ON CONFLICT (search) DO UPDATE SET "
+            "max_id = MAX(max_id, excluded.max_id), "
+            "max_created = MAX(COALESCE(max_created, excluded.max_created), COALESCE(excluded.max_created, max_created))",
+            (key, max_id, max_created),
+        )
+
+    def get_search_stats(self, key: str):
+        """(rata EWMA de anunțuri noi / secundă, ultimul poll, ultima reverificare) pentru o căutare."""
+        row = self.conn.execute(
+            "SELECT rate, last_poll, revalidated FROM search_stats WHERE search = ?", (key,)
+        ).fetchone()
+        return row if row else (None, None, None)
+
+    def set_search_stats(self, key: str, rate, last_poll: float, revalidated=None):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO search_stats (search, rate, last_poll, revalidated) VALUES (?, ?, ?, ?)",
+            (key, rate, last_poll, revalidated),
+        )
+
+    def get_page_cache(self, key: str):
+        """(URL, ETag, Last-Modified, digest ID-uri) ale primei pagini din ultimul ciclu complet, sau None."""
+        return self.conn.execute(
+            "SELECT url, etag, last_modified, digest FROM page_cache WHERE search = ?", (key,)
+        ).fetchone()
+
+    def set_page_cache(self, key: str, url: str, etag=None, last_modified=None, digest=None):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO page_cache (search, url, etag, last_modified, digest) VALUES (?, ?, ?, ?, ?)",
+            (key, url, etag, last_modified, digest),
+        )
+
+    def counts(self) -> dict:
+        return dict(self.conn.execute("SELECT category, COUNT(*) FROM seen GROUP BY category"))
+
+    def push_outbox(self, messages: list):
+        """Păstrează mesajele netrimise pentru rularea următoare."""
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.executemany(
+                "INSERT INTO outbox (chat_id, text, item_id, attempts, created, method, message_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(m["chat_id"], m["text"], m.get("id"), m.get("attempts", 0), m.get("created"), m.get("method"), m.get("message_id"))
+                 for m in messages],
+            )
+
+    def pop_outbox(self) -> list:
+        """Scoate (și șterge) mesajele rămase netrimise la rulările anterioare."""
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            rows = self.conn.execute(
+                "SELECT chat_id, text, item_id, attempts, created, method, message_id FROM outbox ORDER BY seq"
+            ).fetchall()
+            self.conn.execute("DELETE FROM outbox")
+        return [
+            {"chat_id": c, "text": t, "id": i, "attempts": a, "created": ts, "method": m, "message_id": mid}
+            for c, t, i, a, ts, m, mid in rows
+        ]
+
+    def compact(self):
+        """Șterge anunțurile expirate (prin indexul pe ts) și păstrează max 1000 per căutare."""
+        conn = connect(self.path)
+        try:
+            cutoff = time.time() - MAX_AGE.total_seconds()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                expired = conn.execute("DELETE FROM seen WHERE ts <= ?", (cutoff,)).rowcount
+                conn.execute("DELETE FROM alerts WHERE ts <= ?", (cutoff,))
+                trimmed = 0
+                for (category,) in conn.execute(
+                    "SELECT category FROM seen GROUP BY category HAVING COUNT(*) > ?", (MAX_ENTRIES,)
+                ).fetchall():
+                    trimmed += conn.execute(
+                        "DELETE FROM seen WHERE category = ? AND ts < ("
+                        "SELECT ts FROM seen WHERE category = ? ORDER BY ts DESC LIMIT 1 OFFSET ?)",
+                        (category, category, MAX_ENTRIES - 1),
+                    ).rowcount
+            if expired or trimmed:
+                self.log("info", f"🧹 Compactare state: {expired} expirate, {trimmed} peste limita de {MAX_ENTRIES}")
+        except sqlite3.Error as e:
+            self.log("warning", f"Compactarea state a eșuat: {e}")
+        finally:
+            conn.close()
+
+    def compact_in_background(self):
+        """Pornește compactarea pe un thread separat (nu blochează crawl-ul)."""
+        if self._compactor and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self.compact, name="state-compact", daemon=True)
+        self._compactor.start()
+
+    def close(self):
+        if self._compactor:
+            self._compactor.join()
+        self.save_filter()
+        try:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error:
+            pass
+        self.conn.close()
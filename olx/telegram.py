@@ -0,0 +1,340 @@
+import collections, heapq, itertools, os, threading, time
+import requests
+
+from olx.metrics import LogSampler, Metrics
+
+# Configurabil pentru benchmark-uri / teste cu un Bot API local (vezi bench/)
+TELEGRAM_API = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org")
+
+# Limitele Telegram: ~1 mesaj/secundă per chat, ~30 mesaje/secundă global
+CHAT_RATE = 1.0
+GLOBAL_RATE = 30.0
+
+# Rafale: de la DIGEST_MIN mesaje în așteptare pentru același chat, le trimitem ca un singur digest
+DIGEST_MIN = 3
+MESSAGE_LIMIT = 4096   # Lungimea maximă a unui mesaj Telegram (unități UTF-16)
+DIGEST_HEADROOM = 200  # Loc pentru etichetele adăugate ulterior (editări) fără a depăși limita
+
+def text_length(text: str) -> int:
+    """Lungimea textului așa cum o numără Telegram (unități UTF-16: emoji = 2)."""
+    return len(text.encode("utf-16-le")) // 2
+
+class TokenBucket:
+    """Token bucket simplu: `rate` mesaje pe secundă, maxim `capacity` în rafală."""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, now: float) -> float:
+        """Câte secunde mai trebuie așteptat până la următorul token."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+class OutboundMessage:
+    """Un mesaj în așteptare în coada de trimitere."""
+
+    __slots__ = ("seq", "chat_id", "text", "item_id", "attempts", "created", "method", "message_id", "target", "state",
+                 "parts", "parent")
+
+    def __init__(self, seq, chat_id, text, item_id=None, attempts=0, created=None,
+                 method="sendMessage", message_id=None, target=None):
+        self.seq = seq
+        self.chat_id = chat_id
+        self.text = text
+        self.item_id = item_id
+        self.attempts = attempts
+        self.created = created  # Epoch-ul publicării anunțului, pentru latența end-to-end
+        self.method = method
+        # sendMessage: ID-ul primit de la Telegram; editMessageText: mesajul editat
+        self.message_id = message_id
+        self.target = target  # editMessageText pentru un mesaj încă netrimis: îi așteptăm message_id
+        self.state = "queued"  # queued → sending → sent / dropped (merged = inclus într-un digest)
+        self.parts = None   # Digest: mesajele individuale incluse
+        self.parent = None  # Mesaj inclus într-un digest: digest-ul
+
+    def digest_text(self) -> str:
+        return f"📦 {len(self.parts)} anunțuri noi\n\n" + "\n\n".join(part.text for part in self.parts)
+
+    def edit_target_id(self):
+        if self.message_id is None and self.target is not None:
+            return (self.target.parent or self.target).message_id
+        return self.message_id
+
+    def to_dict(self) -> dict:
+        message_id = self.edit_target_id() if self.method != "sendMessage" else None
+        if self.target is not None and self.target.parent is not None:
+            message_id = None  # Editarea unui digest nu poate fi reluată fără textul lui complet
+        return {"chat_id": self.chat_id, "text": self.text, "id": self.item_id, "attempts": self.attempts,
+                "created": self.created, "method": self.method, "message_id": message_id}
+
+class TelegramQueue:
+    """Coadă de trimitere Telegram, golită de un thread dedicat.
+
+    Reactorul Twisted doar adaugă mesaje în coadă; thread-ul le trimite pe o singură
+    conexiune HTTP persistentă, respectând limitele per chat și globale. La 429 se
+    folosește `retry_after` din răspunsul Telegram; erorile temporare rămân în coadă
+    și sunt reîncercate, iar ce nu s-a trimis până la închidere e returnat de `drain()`.
+    """
+
+    def __init__(self, token, logger, chat_rate=CHAT_RATE, global_rate=GLOBAL_RATE, api_base=TELEGRAM_API, metrics=None,
+                 digest_min=DIGEST_MIN):
+        self.base_url = f"{api_base}/bot{token}"
+        self.logger = logger
+        self.metrics = metrics or Metrics()
+        self.log_sampler = LogSampler()
+        self.chat_rate = chat_rate
+        self.digest_min = digest_min  # 0 = fără digest-uri
+        self.session = requests.Session()
+        self.global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        self.chat_buckets = {}
+        self.blocked_until = 0.0  # Pauză globală cerută de Telegram (retry_after)
+
+        self._heap = []
+        self._pending = collections.Counter()  # chat_id -> sendMessage-uri în coadă
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="telegram-queue", daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._heap) + self._in_flight
+
+    def put(self, chat_id, text, item_id=None, attempts=0, created=None, method="sendMessage", message_id=None, target=None):
+        """Adaugă un mesaj în coadă (non-blocant); întoarce OutboundMessage-ul creat."""
+        with self._cond:
+            msg = OutboundMessage(next(self._seq), chat_id, text, item_id, attempts, created, method, message_id, target)
+            heapq.heappush(self._heap, (time.monotonic(), msg.seq, msg))
+            if method == "sendMessage":
+                self._pending[chat_id] += 1
+            depth = len(self._heap) + self._in_flight
+            self._cond.notify()
+        self.metrics.set("telegram_queue_depth", depth)
+        return msg
+
+    def edit(self, chat_id, text, message_id=None, target=None, item_id=None):
+        """Editează un mesaj trimis (după message_id sau după mesajul din coadă care l-a trimis)."""
+        return self.put(chat_id, text, item_id, method="editMessageText", message_id=message_id, target=target)
+
+    def retext(self, msg, text) -> bool:
+        """Schimbă textul unui mesaj încă netrimis; False dacă a plecat deja (sau e pe drum)."""
+        with self._cond:
+            if msg is None:
+                return False
+            if msg.parent is not None:
+                # Inclus într-un digest: textul părții se schimbă oricum (o editare ulterioară îl refolosește)
+                msg.text = text
+                if msg.parent.state != "queued":
+                    return False
+                msg.parent.text = msg.parent.digest_text()
+                return True
+            if msg.state != "queued":
+                return False
+            msg.text = text
+            return True
+
+    def drain(self, timeout: float) -> list:
+        """Așteaptă golirea cozii (max `timeout` secunde) și oprește thread-ul.
+
+        Returnează mesajele rămase netrimise, ca dicționare, pentru a fi păstrate în state.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while (self._heap or self._in_flight) and time.monotonic() < deadline:
+                self._cond.wait(min(1.0, max(0.0, deadline - time.monotonic())))
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join(timeout=15)
+        self.session.close()
+        with self._cond:
+            pending = [msg for _, _, msg in sorted(self._heap)]
+            self._heap.clear()
+            self._pending.clear()
+        # Digest-urile netrimise sunt desfăcute: la rularea următoare se regrupează după coada de atunci
+        return [part.to_dict() for msg in pending for part in (msg.parts or [msg])]
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate)
+        return bucket
+
+    def _next_message(self):
+        """Scoate următorul mesaj pentru care limitele permit trimiterea (sau None la oprire)."""
+        with self._cond:
+            while True:
+                if self._stopping:
+                    return None
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+
+                now = time.monotonic()
+                ready_at, seq, msg = self._heap[0]
+                wait = max(ready_at - now, self.blocked_until - now, self.global_bucket.wait_time(now))
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+
+                heapq.heappop(self._heap)
+                chat_wait = self._chat_bucket(msg.chat_id).wait_time(now)
+                if chat_wait > 0:
+                    # Chat-ul e limitat: lăsăm alte chat-uri să treacă între timp
+                    heapq.heappush(self._heap, (now + chat_wait, seq, msg))
+                    continue
+
+                self.global_bucket.consume()
+                self._chat_bucket(msg.chat_id).consume()
+                if msg.method == "sendMessage" and msg.parts is None:
+                    self._pending[msg.chat_id] -= 1
+                    if self.digest_min and self._pending[msg.chat_id] + 1 >= self.digest_min:
+                        msg = self._coalesce(msg, now)
+                self._in_flight += 1
+                msg.state = "sending"
+                return msg
+
+    def _coalesce(self, first, now: float):
+        """Rafală pentru un chat: unește mesajele lui din coadă într-un digest (max MESSAGE_LIMIT).
+
+        Se apelează cu lock-ul luat; mesajele incluse sunt scoase din heap.
+        """
+        candidates = sorted(
+            (entry for entry in self._heap
+             if entry[2].chat_id == first.chat_id and entry[2].method == "sendMessage" and entry[2].parts is None
+             and (entry[2].attempts == 0 or entry[0] <= now)),
+            key=lambda entry: entry[1],
+        )
+        parts, length = [first], text_length(first.text)
+        budget = MESSAGE_LIMIT - DIGEST_HEADROOM
+        for entry in candidates:
+            size = text_length(entry[2].text) + 2
+            if length + size > budget:
+                break
+            parts.append(entry[2])
+            length += size
+        if len(parts) < 2:
+            return first
+        parts.sort(key=lambda part: part.seq)  # Ordinea în care au fost găsite
+
+        taken = {id(part) for part in parts}
+        self._heap = [entry for entry in self._heap if id(entry[2]) not in taken]
+        heapq.heapify(self._heap)
+        self._pending[first.chat_id] -= len(parts) - 1
+
+        digest = OutboundMessage(first.seq, first.chat_id, "", f"digest de {len(parts)}")
+        digest.parts = parts
+        for part in parts:
+            part.parent = digest
+            part.state = "merged"
+        digest.text = digest.digest_text()
+        self.metrics.inc("telegram_digests_total")
+        self.metrics.inc("telegram_coalesced_total", len(parts))
+        return digest
+
+    def _requeue(self, msg, delay: float):
+        with self._cond:
+            msg.state = "queued"
+            heapq.heappush(self._heap, (time.monotonic() + delay, msg.seq, msg))
+            if msg.method == "sendMessage" and msg.parts is None:
+                self._pending[msg.chat_id] += 1
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            msg = self._next_message()
+            if msg is None:
+                return
+            try:
+                self._send(msg)
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+                    depth = len(self._heap) + self._in_flight
+                    self._cond.notify_all()
+                self.metrics.set("telegram_queue_depth", depth)
+
+    def _send(self, msg):
+        data = {"chat_id": msg.chat_id, "text": msg.text}
+        if msg.parts:
+            data["disable_web_page_preview"] = "true"
+        if msg.method == "editMessageText":
+            origin = msg.target.parent or msg.target if msg.target is not None else None
+            if origin is not None and origin.parts:
+                # Anunțul a plecat într-un digest: edităm digest-ul întreg, cu textul actualizat al părții
+                data["text"] = origin.digest_text()
+                data["disable_web_page_preview"] = "true"
+            message_id = msg.edit_target_id()
+            if message_id is None:
+                if origin is not None and origin.state in ("queued", "sending"):
+                    # Mesajul original n-a plecat încă: reîncercăm după ce primim message_id
+                    self._requeue(msg, 1.0)
+                else:
+                    msg.state = "dropped"
+                    self.logger.debug(f"Editare abandonată pentru {msg.item_id}: mesajul original nu are message_id")
+                return
+            data["message_id"] = message_id
+
+        msg.attempts += 1
+        start = time.perf_counter()
+        try:
+            response = self.session.post(f"{self.base_url}/{msg.method}", data=data, timeout=10)
+        except requests.exceptions.RequestException as e:
+            delay = min(60, 2 ** min(msg.attempts, 6))
+            self.metrics.inc("telegram_retries_total")
+            self.log_sampler.log(self.logger, "warning", "network", f"⚠️ Tentativă {msg.attempts} eșuată pentru Telegram ({msg.item_id}): {e}. Reîncercare în {delay}s...")
+            self._requeue(msg, delay)
+            return
+        self.metrics.observe("telegram_send_seconds", time.perf_counter() - start)
+
+        if response.status_code == 429:
+            try:
+                retry_after = float(response.json().get("parameters", {}).get("retry_after", 5))
+            except ValueError:
+                retry_after = 5.0
+            self.metrics.inc("telegram_rate_limited_total")
+            self.log_sampler.log(self.logger, "warning", 429, f"⚠️ Rate limit Telegram (429). Aștept {retry_after:g}s (retry_after) înainte de retry pentru {msg.item_id}...")
+            with self._cond:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            self._requeue(msg, retry_after)
+        elif response.status_code >= 500:
+            delay = min(60, 2 ** min(msg.attempts, 6))
+            self.metrics.inc("telegram_retries_total")
+            self.log_sampler.log(self.logger, "warning", response.status_code, f"⚠️ Telegram a răspuns {response.status_code} pentru {msg.item_id}. Reîncercare în {delay}s...")
+            self._requeue(msg, delay)
+        elif response.ok:
+            msg.state = "sent"
+            self.metrics.inc("telegram_sent_total", method=msg.method)
+            if msg.method == "editMessageText":
+                self.logger.info(f"✏️ Mesaj editat pentru anunț {msg.item_id}: {msg.text.splitlines()[0][:60]}...")
+                return
+            try:
+                msg.message_id = response.json()["result"]["message_id"]
+            except (ValueError, KeyError, TypeError):
+                pass
+            delivered = time.time()
+            for part in msg.parts or [msg]:
+                part.message_id = msg.message_id
+                if part.created is not None:
+                    self.metrics.observe("alert_lag_seconds", max(0.0, delivered - part.created))
+            if msg.parts:
+                self.logger.info(f"📦 Digest trimis: {len(msg.parts)} anunțuri ({', '.join(str(p.item_id) for p in msg.parts[:5])}...)")
+            else:
+                self.logger.info(f"✅ Notificare trimisă pentru anunț {msg.item_id}: {msg.text.splitlines()[0][:60]}...")
+        else:
+            # 400/401/403: mesajul nu va reuși niciodată (chat inexistent, token greșit etc.)
+            msg.state = "dropped"
+            for part in msg.parts or ():
+                part.state = "dropped"
+            if msg.method == "editMessageText" and "not modified" in response.text:
+                return
+            self.metrics.inc("telegram_dropped_total")
+            self.logger.error(f"❌ Failed to send Telegram message for {msg.item_id}: {response.status_code} {response.text[:200]}")
@@ -0,0 +1,420 @@
+import dataclasses, math, os, time
+from datetime import datetime, timedelta
+
+from olx.api import build_api_url
+from olx.dates import DateExtractor
+from olx.metrics import LogSampler, Metrics
+from olx.offers import decode_page, page_digest, project
+from olx.scheduler import MAX_INTERVAL, MAX_PAGE_SIZE, MIN_INTERVAL, PollSchedule
+from olx.searches import load_searches
+from olx.state import MAX_AGE, SeenStore
+
+def header(response, name: str):
+    """Valoarea unui header de răspuns ca str (Scrapy întoarce bytes, requests str), sau None."""
+    headers = getattr(response, "headers", None)
+    value = headers.get(name) if headers is not None else None
+    return value.decode("latin-1") if isinstance(value, bytes) else value
+
+class Watcher:
+    """Logica unui ciclu de căutare, comună spider-ului Scrapy și poller-ului fără Scrapy (olx.poll).
+
+    Nu face requesturi: primește răspunsurile, decide ce anunțuri sunt noi și când se
+    oprește paginarea, și actualizează watermark-ul / rata fiecărei căutări.
+    Clasa care o folosește trebuie să aibă `logger`.
+    """
+
+    def setup(self, searches=None, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL, metrics_textfile=None):
+        # Lista de căutări: fișier de configurare (-a searches=...) sau SEARCH_URL_* din mediu
+        self.searches = load_searches(searches)
+        if not self.searches:
+            self.logger.warning("⚠️ Nicio căutare configurată (SEARCH_URL_* sau searches.json)")
+
+        for search in self.searches:
+            self.logger.info(f"🔍 Căutare '{search.name}' → categoria: {search.category}")
+            if search.category == "unknown":
+                self.logger.warning(f"⚠️ URL-ul nu conține categorie cunoscută: {search.url}")
+
+        # Deschidem istoricul (state.db) o singură dată pentru toate căutările (pipeline-ul îl refolosește)
+        self.store = SeenStore(logger=self.logger)
+        self.store.adopt_unknown([s.category for s in self.searches])
+        self.store.adopt_categories(self.searches)
+        # Istoricul exact e per căutare: același anunț găsit de altă căutare ajunge și la abonații ei
+        self.seen = {search.key: self.store.load_seen(search.key) for search in self.searches}
+        # Index global id anunț → alertă, comun tuturor căutărilor (folosit de pipeline)
+        self.alerts = self.store.load_alerts()
+        # Amprente (preț, titlu + vânzător) ale anunțurilor văzute: scăderi de preț și republicări
+        self.offers = self.store.load_offer_index()
+        for search in self.searches:
+            search.watermark_id, search.watermark_time = self.store.get_watermark(search.key)
+            if search.watermark_id is not None:
+                self.logger.info(f"🔖 [{search.name}] Watermark: ID > {search.watermark_id}")
+            rate, last_poll, revalidated = self.store.get_search_stats(search.key)
+            search.schedule = PollSchedule(rate, last_poll, float(min_interval), float(max_interval),
+                                           revalidated=revalidated)
+            search.page_cache = self.store.get_page_cache(search.key)
+
+        self.max_offers = 80  # Maxim 80 anunțuri per căutare la un poll obișnuit (în pagini de mărime variabilă)
+        self.max_consecutive_seen = 30  # Oprește dacă 30 consecutive sunt deja văzute
+
+        # Filtrare după data publicării: doar anunțuri din ultimele 4 ore
+        self.min_time = datetime.now() - timedelta(hours=4)
+        # Calea câmpului de dată e învățată din primul anunț al fiecărui răspuns
+        self.dates = DateExtractor()
+
+        # Metrici (stats Scrapy + export Prometheus opțional) și log-uri repetate limitate
+        self.metrics = Metrics()
+        self.metrics_textfile = metrics_textfile or os.getenv("METRICS_TEXTFILE")
+        self.metrics_written = 0.0
+        self.log_sampler = LogSampler()
+        # Polluri cu prima pagină neschimbată (304 / același digest), din cele verificate
+        self.page_cache_hits = 0
+        self.page_cache_lookups = 0
+
+    def start_cycle(self, search) -> list:
+        """Începe un ciclu: [(număr pagină, URL)] de cerut imediat — una singură sau fan-out la recuperare."""
+        search.reset()
+        self.min_time = datetime.now() - timedelta(hours=4)
+        now = time.time()
+        if search.watermark_id is not None and search.schedule.revalidation_due(now):
+            # Reverificare: prima pagină fără watermark, ca schimbările de preț ale anunțurilor
+            # deja văzute (ID-uri sub watermark) să fie observate; watermark-ul nu avansează
+            search.revalidating = True
+            search.page_size, search.fan_out, search.max_pages = MAX_PAGE_SIZE, 1, 1
+            self.metrics.observe("olx_page_size", search.page_size, search=search.name)
+            return [(1, build_api_url(search.url, offset=0, limit=search.page_size))]
+        search.page_size, search.fan_out = search.schedule.page_plan(now)
+        self.metrics.observe("olx_page_size", search.page_size, search=search.name)
+        if search.fan_out > 1:
+            # Recuperare (prima rulare, pauză lungă): offset-urile 0, 50, 100... cerute simultan,
+            # sortate după dată ca paginile să fie consecutive; sunt procesate în ordine
+            search.max_pages = search.fan_out
+            self.logger.info(
+                f"⏩ [{search.name}] Recuperare: {search.fan_out} pagini x {search.page_size} anunțuri, cerute simultan"
+            )
+        else:
+            search.max_pages = max(1, math.ceil(self.max_offers / search.page_size))
+        # Cu watermark, OLX întoarce doar anunțurile mai noi (o căutare liniștită = un request mic)
+        return [
+            (page + 1, build_api_url(search.url, offset=page * search.page_size, limit=search.page_size,
+                                     min_id=search.watermark_id, newest_first=search.fan_out > 1))
+            for page in range(search.fan_out)
+        ]
+
+    def end_cycle(self, search):
+        """Sfârșitul ciclului unei căutări: metrici, watermark și rata de anunțuri noi."""
+        search.done = True
+        if search.buffered:
+            self.metrics.inc("olx_pages_cancelled_total", len(search.buffered), search=search.name)
+            search.buffered.clear()
+        self.metrics.observe("olx_pages_per_cycle", search.page_count, search=search.name)
+        self.metrics.inc("olx_stop_total", search=search.name, reason=search.stop_reason or "last_page")
+        if search.failed:
+            self.logger.info(f"🔖 [{search.name}] Ciclu incomplet, watermark-ul rămâne {search.watermark_id}")
+            search.schedule.record_failure()
+        else:
+            # Reverificarea citește o singură pagină în ordinea căutării: watermark-ul rămâne neschimbat
+            if search.next_page_cache is not None and search.stop_reason != "unchanged":
+                search.page_cache = search.next_page_cache
+                self.store.set_page_cache(search.key, *search.page_cache)
+            if not search.revalidating and search.advance_watermark() and search.max_id is not None:
+                self.store.set_watermark(search.key, search.max_id, search.max_created)
+                self.logger.info(f"🔖 [{search.name}] Watermark nou: ID {search.max_id}")
+            now = time.time()
+            if search.revalidating or search.fan_out > 1:
+                search.schedule.revalidated = now
+            search.schedule.record(search.new_count, now)
+            self.store.set_search_stats(search.key, search.schedule.rate, search.schedule.last_poll,
+                                        search.schedule.revalidated)
+
+    def write_metrics(self):
+        try:
+            self.metrics.write_textfile(self.metrics_textfile)
+            self.metrics_written = time.monotonic()
+        except OSError as e:
+            self.log_sampler.log(self.logger, "warning", "metrics_textfile", f"⚠️ Nu pot scrie metricile în {self.metrics_textfile}: {e}")
+
+    def reload_seen(self, _=None):
+        for key in self.seen:
+            self.seen[key] = self.store.load_seen(key)
+        # Indexul de alerte e curățat pe loc: intrările recente păstrează mesajele din coadă
+        self.store.save_message_ids(self.alerts)
+        cutoff = time.time() - MAX_AGE.total_seconds()
+        for uid in [uid for uid, record in self.alerts.items() if record.ts <= cutoff]:
+            del self.alerts[uid]
+        self.offers = self.store.load_offer_index()
+        self.store.save_filter()
+        self.report_filter()
+        self.logger.info(f"🧹 Istoric reîncărcat: {sum(map(len, self.seen.values()))} anunțuri în memorie")
+
+    def parse_page(self, search, response):
+        """Procesează o pagină api/v1/offers (orice obiect cu status, url și body): produce anunțurile noi.
+
+        Dacă la final `search.stop_reason` a rămas None, ciclul continuă cu `search.next_url`.
+        """
+        seen = self.seen[search.key]
+        search.page_count += 1
+        
+        # Verifică dacă am depășit limita de pagini
+        if search.page_count > search.max_pages:
+            self.logger.info(f"[{search.name}] Limită de {search.max_pages} pagini atinsă. Oprește paginarea.")
+            search.stop_reason = "max_pages"
+            return
+
+        # Prima pagină a unui poll obișnuit: neschimbată față de ciclul anterior = ciclul se încheie aici
+        first_page = search.page_count == 1 and search.fan_out == 1
+        if first_page and response.status == 304:
+            self.page_unchanged(search, "304 Not Modified")
+            return
+
+        # Verifică status code
+        if response.status != 200:
+            self.log_sampler.log(
+                self.logger, "warning", ("status", search.name, response.status),
+                f"[{search.name}] Status code {response.status} pentru {response.url}",
+            )
+            # Retry automat dacă e configurat
+            search.failed = True
+            search.stop_reason = f"http_{response.status}"
+            return
+
+        try:
+            # Parsare direct din bytes (orjson dacă e instalat); păstrăm doar câmpurile folosite
+            raw_offers, next_url = decode_page(response.body)
+        except ValueError as e:
+            self.logger.error(f"Failed to parse OLX JSON: {e}. Response: {response.body[:200]!r}")
+            search.failed = True
+            search.stop_reason = "decode_error"
+            return
+        except Exception as e:
+            self.logger.error(f"Unexpected error parsing response: {e}")
+            search.failed = True
+            search.stop_reason = "decode_error"
+            return
+
+        if first_page:
+            etag, modified = header(response, "ETag"), header(response, "Last-Modified")
+            # Fără validatori de la server, comparăm lista ordonată de ID-uri (fără proiecție / date / seen)
+            digest = None if etag or modified else page_digest(raw_offers)
+            search.next_page_cache = (response.url, etag, modified, digest)
+            # La reverificare contează și prețurile, nu doar ID-urile
+            if (digest is not None and not search.revalidating and search.page_cache is not None
+                    and digest == search.page_cache[3]):
+                self.page_unchanged(search, "același digest")
+                return
+            self.page_cache_lookups += 1
+            self.metrics.inc("olx_page_cache_total", search=search.name, result="miss")
+
+        items_in_page = 0
+        new_items = 0
+        skipped_old = 0  # Contor pentru anunțuri prea vechi
+        no_date_count = 0  # Contor pentru anunțuri fără dată
+        reposts = 0  # Republicări (ID nou, aceeași amprentă) fără scădere de preț
+        price_drops = 0
+        new_ids = []  # Listă cu ID-urile anunțurilor noi
+        reached_watermark = False  # Am ajuns la anunțuri procesate deja într-un ciclu anterior
+        
+        date_path = self.dates.path_for(raw_offers[0]) if raw_offers else None
+
+        for raw in raw_offers:
+            offer = project(raw, self.dates, date_path)
+            if offer is None:
+                continue
+            uid = offer.id
+
+            # Watermark: primul anunț nepromovat cu ID <= watermark înseamnă că restul e deja procesat
+            # (la reverificare, pagina e parcursă întreagă)
+            if (offer.numeric_id is not None and search.is_below_watermark(offer.numeric_id)
+                    and not offer.promoted and not search.revalidating):
+                reached_watermark = True
+                break
+
+            # Anunț deja văzut de această căutare, cu alt preț față de ultima ei vizită (O(1)); prețul nou
+            # e notat pentru toate căutările care l-au văzut, iar anunțul rămâne „văzut”, nu nou
+            old_price = self.offers.seen_price(search.key, uid) if uid in seen else None
+            if old_price is not None and offer.price_value is not None and offer.price_value != old_price:
+                self.offers.update_price(uid, offer.price_value)
+                self.store.update_price(uid, offer.price_value)
+                if offer.price_value < old_price:
+                    price_drops += 1
+                    self.metrics.inc("olx_price_drops_total", search=search.name)
+                    yield dataclasses.replace(
+                        offer, previous_price=old_price, category=search.category, search=search.name,
+                        description=raw.get("description") if search.filters else None,
+                    )
+
+            items_in_page += 1
+            
+            # Data e extrasă la proiecție: calea învățată (rapid), cu fallback la scanarea recursivă
+            offer_time = offer.created_time
+            if offer.numeric_id is not None:
+                search.observe(offer.numeric_id, offer_time.timestamp() if offer_time else None)
+            
+            # Dacă nu am găsit data, logăm un warning dar permitem anunțul (pentru a nu pierde anunțuri valide)
+            if not offer_time:
+                no_date_count += 1
+                # Cheia e schema anunțului: dacă OLX schimbă formatul, logăm câteva exemple, nu fiecare anunț
+                self.log_sampler.log(
+                    self.logger, "warning", ("no_date", tuple(raw)),
+                    lambda: f"Anunț {uid}: nu s-a putut determina data publicării. Câmpuri disponibile: {list(raw)[:15]}",
+                )
+                # Permitem anunțul dacă nu putem determina data (pentru siguranță)
+            elif offer_time < self.min_time:
+                # Anunțul e prea vechi, îl ignorăm
+                skipped_old += 1
+                self.logger.debug(f"Anunț {uid} ignorat: prea vechi (data: {offer_time.strftime('%Y-%m-%d %H:%M')}, minim: {self.min_time.strftime('%Y-%m-%d %H:%M')})")
+                continue
+            
+            # Verifică dacă e deja văzut: setul exact (7 zile), apoi filtrul Bloom (orizont lung)
+            if uid not in seen and self.store.filter.contains(search.key, uid):
+                self.metrics.inc("olx_seen_filter_hits_total", search=search.name)
+                seen.add(uid)
+            if uid in seen:
+                search.consecutive_seen += 1
+                self.logger.debug(f"Anunț {uid} deja văzut. Consecutive seen: {search.consecutive_seen}")
+                
+                # Dacă 10 consecutive sunt deja văzute, oprește
+                if search.consecutive_seen >= self.max_consecutive_seen and not search.revalidating:
+                    self.logger.info(
+                        f"[{search.name}] Oprește paginarea: {search.consecutive_seen} anunțuri consecutive "
+                        f"deja văzute (limită: {self.max_consecutive_seen})"
+                    )
+                    search.stop_reason = "consecutive_seen"
+                    self.record_page(search, items_in_page, new_items, no_date_count)
+                    return
+            else:
+                # Resetăm contorul când găsim unul nou
+                search.consecutive_seen = 0
+                original = self.offers.original(uid, offer.fingerprint)
+                if original is not None:
+                    # Republicare (șters și repostat): alertă doar dacă prețul a scăzut față de original,
+                    # sau pentru chat-urile căutării care nu au primit originalul
+                    original_price = self.offers.prices.get(original)
+                    if original_price is None or offer.price_value is None or offer.price_value >= original_price:
+                        record = self.alerts.get(original)
+                        if record is not None and set(search.chats) <= set(record.chats):
+                            reposts += 1
+                            self.metrics.inc("olx_reposts_total", search=search.name)
+                            self.remember(search, offer, offer_time)
+                            continue
+                        offer.original = original
+                    else:
+                        offer.previous_price = original_price
+                        offer.relisted = True
+                if offer.relisted:
+                    self.offers.prices[original] = offer.price_value
+                new_items += 1
+                new_ids.append(uid)
+                offer.created_time = offer_time or datetime.now()
+                offer.category = search.category  # Adăugăm categoria pentru pipeline
+                offer.search = search.name
+                if search.filters:
+                    # Filtrele abonaților sunt aplicate per chat, în pipeline
+                    offer.description = raw.get("description")
+                search.new_count += 1
+                self.offers.add(search.key, uid, offer.price_value, offer.fingerprint)
+                yield offer
+                # Adăugăm imediat în seen pentru a evita duplicatele în aceeași sesiune
+                seen.add(uid)
+
+        self.record_page(search, items_in_page, new_items, no_date_count)
+
+        # Logging îmbunătățit cu statistici detaliate
+        new_ids_preview = new_ids[:5] if new_ids else []
+        self.logger.info(
+            f"[{search.name.upper()}] Pagina {search.page_count}: {items_in_page} anunțuri procesate\n"
+            f"  ✅ {new_items} noi găsite" + (f" (primele: {new_ids_preview})" if new_ids_preview else "") + "\n"
+            f"  ⏭️ {items_in_page - new_items - skipped_old - no_date_count} deja văzute (seen set: {len(seen)} anunțuri)\n"
+            + (f"  ♻️ {reposts} republicate (ignorate)\n" if reposts else "")
+            + (f"  📉 {price_drops} cu preț scăzut\n" if price_drops else "") +
+            f"  ⏰ {skipped_old} prea vechi (ignorate, minim: {self.min_time.strftime('%Y-%m-%d %H:%M')})\n"
+            f"  ⚠️ {no_date_count} fără dată (procesate pentru siguranță)\n"
+            f"  📊 Consecutive seen: {search.consecutive_seen}/{self.max_consecutive_seen}"
+        )
+
+        # Pagină goală (ex. nimic peste watermark): nu are rost să cerem următoarea
+        if not raw_offers:
+            search.stop_reason = "empty"
+            return
+
+        if reached_watermark:
+            self.logger.info(f"[{search.name}] Oprește paginarea: watermark atins (ID <= {search.watermark_id})")
+            search.stop_reason = "watermark"
+            return
+
+        # Verifică dacă trebuie să continuăm paginarea
+        if search.consecutive_seen >= self.max_consecutive_seen:
+            self.logger.info(f"[{search.name}] Oprește paginarea: prea multe anunțuri consecutive deja văzute")
+            search.stop_reason = "consecutive_seen"
+            return
+
+        # Pagina următoare (doar dacă nu am atins limita): o cere apelantul, la fan-out e deja cerută
+        if next_url and search.page_count < search.max_pages:
+            search.next_url = next_url
+        else:
+            search.stop_reason = "max_pages" if next_url else "last_page"
+
+    def conditional_headers(self, search, page: int, url: str) -> dict:
+        """If-None-Match / If-Modified-Since pentru prima pagină, dacă URL-ul e cel din ciclul anterior."""
+        cache = search.page_cache
+        if page != 1 or search.fan_out > 1 or cache is None or cache[0] != url:
+            return {}
+        headers = {}
+        if cache[1]:
+            headers["If-None-Match"] = cache[1]
+        if cache[2]:
+            headers["If-Modified-Since"] = cache[2]
+        return headers
+
+    def page_unchanged(self, search, how: str):
+        """Prima pagină e identică cu cea din ciclul anterior: nimic nou, fără parsare."""
+        self.page_cache_hits += 1
+        self.page_cache_lookups += 1
+        self.metrics.inc("olx_page_cache_total", search=search.name, result="hit")
+        self.logger.debug(f"[{search.name}] Prima pagină neschimbată ({how}), ciclu încheiat")
+        search.stop_reason = "unchanged"
+
+    def report_filter(self):
+        """Mărimea și rata estimată de fals pozitive a filtrului Bloom (metrici + log)."""
+        bloom = self.store.filter
+        fp_rate = bloom.estimated_fp_rate()
+        self.metrics.set("olx_seen_filter_fp_ratio", fp_rate)
+        self.metrics.set("olx_seen_filter_bytes", bloom.nbytes)
+        self.logger.info(
+            f"🌸 Filtru Bloom: {len(bloom)} felii, {bloom.nbytes / 1024:.0f} KB, "
+            f"FP estimat {fp_rate:.4%} (țintă {bloom.fp_rate:.4%})"
+        )
+
+    def remember(self, search, offer, offer_time):
+        """Anunț republicat, văzut fără alertă: în seen, în state.db și în indexul de amprente."""
+        self.store.add(search.key, offer.id, offer_time, offer.price_value, offer.fingerprint)
+        self.offers.add(search.key, offer.id, offer.price_value, offer.fingerprint)
+        self.seen[search.key].add(offer.id)
+
+    def record_page(self, search, processed: int, new: int, no_date: int):
+        self.metrics.observe("olx_offers_per_page", processed, search=search.name)
+        if new:
+            self.metrics.inc("olx_new_offers_total", new, search=search.name)
+        if no_date:
+            self.metrics.inc("olx_offers_without_date_total", no_date, search=search.name)
+
+    def log_summary(self):
+        """Sumarul de la final: extragerea datei, filtrul Bloom și latențele fetch / alertă."""
+        self.logger.info(
+            f"📅 Extragere dată: {self.dates.fast_hits} pe calea învățată, "
+            f"{self.dates.fallbacks} cu scanare completă"
+        )
+        self.report_filter()
+        if self.page_cache_lookups:
+            ratio = self.page_cache_hits / self.page_cache_lookups
+            self.metrics.set("olx_page_cache_hit_ratio", ratio)
+            self.logger.info(
+                f"♻️ Prima pagină neschimbată: {self.page_cache_hits}/{self.page_cache_lookups} polluri ({ratio:.0%})"
+            )
+
+        fetch = self.metrics.histogram("olx_fetch_seconds")
+        lag = self.metrics.histogram("alert_lag_seconds")
+        if fetch:
+            self.logger.info(
+                f"📈 Fetch p50 {fetch.quantile(0.5):.2f}s / p95 {fetch.quantile(0.95):.2f}s ({fetch.count} pagini)"
+                + (f", lag alertă p50 {lag.quantile(0.5):.0f}s / p95 {lag.quantile(0.95):.0f}s ({lag.count} mesaje)" if lag else "")
+            )
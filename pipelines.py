@@ -1,158 +1,196 @@
-import os, json, requests, time
-from pathlib import Path
-from datetime import datetime, timedelta
+import os
+
+from olx.metrics import Metrics
+from olx.searches import default_chats
+from olx.state import AlertRecord, SeenStore
+from olx.telegram import CHAT_RATE, DIGEST_MIN, GLOBAL_RATE, TelegramQueue
+
+def format_alert(item, categories) -> str:
+    """Textul notificării; toate categoriile care au găsit anunțul apar ca etichete."""
+    tags = " · ".join(c.upper() for c in categories)
+    if item.previous_price is not None:
+        return format_price_drop(item, tags)
+    return f"🆕 [{tags}] {item.title} – {item.price or 'fără preț'}\n{item.url}"
+
+def format_price_drop(item, tags) -> str:
+    """Scădere de preț: prețul anterior și cel nou (și dacă anunțul a fost republicat)."""
+    relisted = " (republicat)" if item.relisted else ""
+    return f"📉 [{tags}] {item.title} – {item.previous_price:g} → {item.price}{relisted}\n{item.url}"
 
 class TelegramPipeline:
     def open_spider(self, spider):
-        self.chat_id = os.getenv("TELEGRAM_CHAT_ID")
-        self.token   = os.getenv("TELEGRAM_BOT_TOKEN")
-        self.state_file = Path("state.json")
-        
-        self.category = getattr(spider, 'category', 'unknown')
-        self.last_message_time = 0
-        self.message_delay = 0.5  # Delay între mesaje pentru a evita rate limiting
-        
-        if self.state_file.exists():
-            try:
-                data = json.loads(self.state_file.read_text())
-                if isinstance(data, dict):
-                    self.state_data = data
-                elif isinstance(data, list):
-                    self.state_data = {"unknown": data}
-                else:
-                    self.state_data = {}
-            except Exception as e:
-                spider.logger.warning(f"Eroare la încărcarea state.json: {e}")
-                self.state_data = {}
-        else:
-            self.state_data = {}
-        
-        # Curățăm categoria "unknown" dacă există (migrare de la format vechi)
-        if "unknown" in self.state_data and self.category != "unknown":
-            unknown_data = self.state_data.get("unknown", [])
-            if isinstance(unknown_data, list) and len(unknown_data) > 0:
-                spider.logger.info(f"🔄 Găsită categorie 'unknown' cu {len(unknown_data)} anunțuri - migrare în progres...")
-                
-                # Dacă categoria curentă nu există sau e goală, mutăm datele din "unknown"
-                if self.category not in self.state_data or len(self.state_data.get(self.category, [])) == 0:
-                    spider.logger.info(f"  → Mutăm anunțurile din 'unknown' la categoria '{self.category}'")
-                    self.state_data[self.category] = unknown_data
-                    self.state_data.pop("unknown", None)
-                else:
-                    # Dacă categoria există deja, ștergem doar "unknown"
-                    spider.logger.info(f"  → Categoria '{self.category}' există deja, ștergem 'unknown'")
-                    self.state_data.pop("unknown", None)
-            else:
-                # "unknown" e goală, ștergem-o
-                self.state_data.pop("unknown", None)
-        
-        category_list = self.state_data.get(self.category, [])
-        if isinstance(category_list, list) and len(category_list) > 0:
-            if isinstance(category_list[0], str):
-                category_list = [{"id": id, "timestamp": datetime.now().isoformat()} for id in category_list]
-            # Cleanup: șterge anunțurile mai vechi de 7 zile
-            cutoff_time = datetime.now() - timedelta(days=7)
-            category_list = [
-                item for item in category_list 
-                if isinstance(item, dict) and item.get("timestamp") and 
-                datetime.fromisoformat(item.get("timestamp", "")) > cutoff_time
-            ]
-            category_list = sorted(category_list, key=lambda x: x.get("timestamp", ""), reverse=True)[:1000]
-        else:
-            category_list = []
-        
-        self.state_data[self.category] = category_list
-        
-        self.seen = {item["id"] for item in category_list if isinstance(item, dict) and "id" in item}
-        
-        if hasattr(spider, 'seen'):
-            self.seen.update(spider.seen)
-            spider.seen.update(self.seen)
+        self.token = os.getenv("TELEGRAM_BOT_TOKEN")
+        # Abonamentele: căutare → chat-uri (fiecare căutare e cerută o singură dată, oricâți abonați are)
+        searches = getattr(spider, "searches", ())
+        self.subscribers = {search.name: search.chats for search in searches}
+        self.search_categories = {search.name: search.category for search in searches}
+        # Filtrele per abonament (căutare, chat): același URL e cerut o dată, filtrat la trimitere
+        self.search_filters = {search.name: search.filters for search in searches}
+        # Istoricul exact (seen) e per căutare, sub cheia ei (Search.key)
+        self.search_keys = {search.name: search.key for search in searches}
+        self.search_names = {search.key: search.name for search in searches}
+        self.default_chats = default_chats()
+        # Cât așteptăm la final ca mesajele din coadă să plece (restul rămân în state.db)
+        self.drain_timeout = float(os.getenv("TELEGRAM_DRAIN_TIMEOUT", "120"))
+
+        # state.db e deschis o singură dată de spider pentru toate căutările
+        self.store = getattr(spider, "store", None) or SeenStore(logger=spider.logger)
+        self.seen = getattr(spider, "seen", {})
+        # Indexul global id anunț → alertă: un anunț găsit de mai multe căutări = un singur mesaj
+        self.alerts = getattr(spider, "alerts", None)
+        if self.alerts is None:
+            self.alerts = self.store.load_alerts()
+        self.metrics = getattr(spider, "metrics", None) or Metrics()
+        self.price_drops = {}  # (id anunț, preț nou) → chat-urile anunțate deja de scăderea de preț
+        # Expirarea / compactarea istoricului rulează în fundal cât timp facem crawl
+        self.store.compact_in_background()
+
+        # Trimiterea se face pe un thread separat, ca reactorul să continue crawl-ul
+        self.queue = TelegramQueue(
+            self.token,
+            spider.logger,
+            chat_rate=float(os.getenv("TELEGRAM_CHAT_RATE", CHAT_RATE)),
+            global_rate=float(os.getenv("TELEGRAM_GLOBAL_RATE", GLOBAL_RATE)),
+            metrics=self.metrics,
+            # Rafale (prima rulare după o pauză, căutări aglomerate): mai multe anunțuri într-un mesaj
+            digest_min=int(os.getenv("TELEGRAM_DIGEST_MIN", DIGEST_MIN)),
+        )
+
+        # Mesajele rămase netrimise la rularea anterioară sunt reîncercate primele
+        outbox = self.store.pop_outbox()
+        if outbox:
+            spider.logger.info(f"📤 Reîncercăm {len(outbox)} mesaje rămase netrimise la rularea anterioară")
+        for msg in outbox:
+            queued = self.queue.put(
+                msg["chat_id"], msg["text"], msg.get("id"), msg.get("attempts", 0), msg.get("created"),
+                msg.get("method") or "sendMessage", msg.get("message_id"),
+            )
+            # Alerta reîncercată își va afla message_id-ul abia acum
+            record = self.alerts.get(msg.get("id"))
+            if queued.method == "sendMessage" and record is not None and record.chats.get(queued.chat_id) is None:
+                record.msgs[queued.chat_id] = queued
 
     def process_item(self, item, spider):
-        category = item.get("category") or getattr(spider, 'category', 'unknown')
-        
-        category_list = self.state_data.get(category, [])
-        
-        if item["id"] not in self.seen:
-            text = f"🆕 [{category.upper()}] {item['title']} – {item['price'] or 'fără preț'}\n{item['link']}"
-            try:
-                # Delay între mesaje pentru a evita rate limiting
-                current_time = time.time()
-                time_since_last = current_time - self.last_message_time
-                if time_since_last < self.message_delay:
-                    time.sleep(self.message_delay - time_since_last)
-                
-                max_retries = 3
-                for attempt in range(max_retries):
-                    try:
-                        response = requests.get(
-                            f"https://api.telegram.org/bot{self.token}/sendMessage",
-                            params={"chat_id": self.chat_id, "text": text},
-                            timeout=10,
-                        )
-                        response.raise_for_status()
-                        self.last_message_time = time.time()
-                        spider.logger.info(f"✅ Notificare trimisă pentru anunț {item['id']} ({category}): {item['title'][:50]}...")
-                        break
-                    except requests.exceptions.RequestException as e:
-                        if "429" in str(e) or "Too Many Requests" in str(e):
-                            retry_delay = 10 + (attempt * 5)  # Delay mai mare pentru 429
-                            spider.logger.warning(f"⚠️ Rate limit Telegram (429). Aștept {retry_delay}s înainte de retry {attempt + 1}/{max_retries}...")
-                            time.sleep(retry_delay)
-                        elif attempt < max_retries - 1:
-                            spider.logger.warning(f"⚠️ Tentativă {attempt + 1}/{max_retries} eșuată pentru Telegram: {e}. Reîncercare...")
-                            time.sleep(2 ** attempt)
-                        else:
-                            raise
-                
-                timestamp = item.get("created_time") or datetime.now().isoformat()
-                category_list.append({"id": item["id"], "timestamp": timestamp})
-                self.seen.add(item["id"])
-                
-                # Cleanup: șterge anunțurile mai vechi de 7 zile
-                cutoff_time = datetime.now() - timedelta(days=7)
-                category_list = [
-                    item for item in category_list 
-                    if isinstance(item, dict) and item.get("timestamp") and 
-                    datetime.fromisoformat(item.get("timestamp", "")) > cutoff_time
-                ]
-                category_list = sorted(category_list, key=lambda x: x.get("timestamp", ""), reverse=True)[:1000]
-                self.state_data[category] = category_list
-                
-                self.seen = {item["id"] for item in category_list if isinstance(item, dict) and "id" in item}
-                
-                if hasattr(spider, 'seen'):
-                    spider.seen.add(item["id"])
-            except Exception as e:
-                spider.logger.error(f"❌ Failed to send Telegram message for {item['id']}: {e}")
-        else:
-            spider.logger.debug(f"⏭️ Anunț {item['id']} deja văzut în categoria {category}, ignorat")
+        category = item.category or getattr(spider, 'category', 'unknown')
+        key = self.search_keys.get(item.search, category)
+        search_seen = self.seen.setdefault(key, set())
+
+        # Deduplicarea în aceeași căutare o face spider-ul (același set în memorie);
+        # între căutări diferite decide indexul global de alerte (lookup O(1) în dict), per chat
+        chats = self.subscribers.get(item.search) or self.default_chats
+        record = self.alerts.get(item.id)
+        if item.previous_price is not None and not item.relisted:
+            # Anunț deja văzut, cu preț mai mic: un mesaj nou, fără a schimba alerta inițială
+            self.price_drop(item, record, record.chats if record is not None else chats, spider)
+            return item
+        changed = record is None
+        if record is None:
+            record = self.alerts[item.id] = AlertRecord([], [])
+        tags_before = {chat: self.tags(record, chat) for chat in chats if chat in record.chats}
+        if item.search not in record.searches:
+            record.searches.append(item.search)
+            changed = True
+        if category not in record.categories:
+            record.categories.append(category)
+
+        # Latența alertei: doar pentru anunțurile cu dată (created_time e „acum” pentru cele fără)
+        created = item.created_epoch
+        # Republicare fără scădere de preț: chat-urile care au primit anunțul original sunt sărite
+        original = self.alerts.get(item.original) if item.original is not None else None
+        for chat in chats:
+            tags = self.tags(record, chat)
+            if original is not None and chat in original.chats:
+                continue
+            if chat not in record.chats:
+                if self.rejects(item, chat):
+                    continue
+                # Non-blocant: mesajul intră în coadă, iar anunțul e marcat imediat ca văzut
+                # (dacă trimiterea eșuează, mesajul rămâne în coadă / în state.db, nu se pierde)
+                record.msgs[chat] = self.queue.put(chat, format_alert(item, tags), item.id, created=created)
+                record.chats[chat] = None
+                changed = True
+            elif tags != tags_before[chat]:
+                self.add_tag(item, record, chat, tags, spider)
+        if changed:
+            self.store.save_alert(item.id, record)
+
+        self.store.add(key, item.id, item.created_time, item.price_value, item.fingerprint)
+        search_seen.add(item.id)
         return item
 
-    def close_spider(self, spider):
-        category = getattr(spider, 'category', 'unknown')
-        category_list = self.state_data.get(category, [])
-        
-        if hasattr(spider, 'seen'):
-            for sid in spider.seen:
-                if sid not in self.seen:
-                    category_list.append({"id": sid, "timestamp": datetime.now().isoformat()})
-        
-        # Cleanup: șterge anunțurile mai vechi de 7 zile
-        cutoff_time = datetime.now() - timedelta(days=7)
-        category_list = [
-            item for item in category_list 
-            if isinstance(item, dict) and item.get("timestamp") and 
-            datetime.fromisoformat(item.get("timestamp", "")) > cutoff_time
+    def price_drop(self, item, record, chats, spider):
+        """Mesajul de scădere a prețului, o dată per chat și preț (anunțul poate fi găsit de mai multe căutări).
+
+        Îl primesc chat-urile care au primit alerta anunțului, nu doar abonații căutării curente.
+        """
+        drops = self.price_drops.setdefault((item.id, item.price_value), set())
+        for chat in chats:
+            if chat in drops or self.rejects(item, chat):
+                continue
+            tags = self.tags(record, chat) if record is not None else [item.category]
+            self.queue.put(chat, format_alert(item, tags), item.id)
+            drops.add(chat)
+        spider.logger.info(f"📉 Anunț {item.id}: preț scăzut de la {item.previous_price:g} la {item.price}")
+
+    def rejects(self, item, chat_id) -> bool:
+        """Filtrele abonamentului chat-ului la căutarea anunțului; respingerile sunt numărate per chat și motiv."""
+        filters = self.search_filters.get(item.search, {}).get(chat_id)
+        if not filters:
+            return False
+        reasons = [f.reject_reason(item, item.description) for f in filters]
+        if None in reasons:
+            return False
+        self.metrics.inc("olx_filtered_total", search=item.search, chat=chat_id, reason=reasons[0])
+        return True
+
+    def tags(self, record, chat_id) -> list:
+        """Etichetele unui chat: categoriile căutărilor lui care au găsit anunțul."""
+        tags = [
+            self.search_categories.get(search) for search in record.searches
+            if chat_id in (self.subscribers.get(search) or self.default_chats)
         ]
-        category_list = sorted(category_list, key=lambda x: x.get("timestamp", ""), reverse=True)[:1000]
-        self.state_data[category] = category_list
-        
-        # Ștergem definitiv "unknown" la final (în caz că mai există)
-        if "unknown" in self.state_data:
-            spider.logger.info(f"🧹 Curățare finală: ștergem categoria 'unknown' din state.json")
-            self.state_data.pop("unknown", None)
-        
-        self.state_file.write_text(json.dumps(self.state_data, indent=2))
-        spider.logger.info(f"💾 Salvat state.json pentru categoria {category}: {len(category_list)} anunțuri (max 1000)")
+        return list(dict.fromkeys(tag for tag in tags if tag)) or record.categories[:1]
+
+    def add_tag(self, item, record, chat_id, tags, spider):
+        """Anunț deja trimis în chat de altă căutare: adăugăm eticheta, fără un mesaj nou."""
+        self.metrics.inc("alerts_merged_total", search=item.search)
+        text = format_alert(item, tags)
+        msg = record.msgs.get(chat_id)
+        # Încă în coadă: doar schimbăm textul; altfel edităm mesajul trimis
+        if self.queue.retext(msg, text):
+            spider.logger.info(f"🔗 Anunț {item.id} găsit și de '{item.search}': etichetă adăugată în mesajul din coadă")
+            return
+        message_id = record.resolved_message_id(chat_id)
+        if message_id is None and msg is None:
+            spider.logger.info(f"🔗 Anunț {item.id} găsit și de '{item.search}' (mesajul inițial nu poate fi editat)")
+            return
+        self.queue.edit(chat_id, text, message_id=message_id, target=msg, item_id=item.id)
+        spider.logger.info(f"🔗 Anunț {item.id} găsit și de '{item.search}': editez mesajul trimis")
+
+    def close_spider(self, spider):
+        from twisted.internet import threads  # Doar sub Scrapy: olx.poll nu încarcă Twisted
+
+        self._log_pending(spider)
+        d = threads.deferToThread(self.queue.drain, self.drain_timeout)
+        d.addCallback(self._close_store, spider)
+        return d
+
+    def close(self, spider):
+        """Ca close_spider, dar blocant (olx.poll, fără reactor)."""
+        self._log_pending(spider)
+        self._close_store(self.queue.drain(self.drain_timeout), spider)
+
+    def _log_pending(self, spider):
+        if len(self.queue):
+            spider.logger.info(f"📨 Așteptăm trimiterea a {len(self.queue)} mesaje din coadă (max {self.drain_timeout:g}s)...")
+
+    def _close_store(self, pending, spider):
+        if pending:
+            spider.logger.warning(f"⚠️ {len(pending)} mesaje netrimise rămân în state.db pentru rularea următoare")
+            self.store.push_outbox(pending)
+
+        # message_id-urile primite de la Telegram, pentru editări la rulările următoare
+        self.store.save_message_ids(self.alerts)
+        summary = ", ".join(f"{self.search_names.get(k, k)}: {n}" for k, n in self.store.counts().items())
+        self.store.close()
+        spider.logger.info(f"💾 Salvat state.db ({summary}) (max 1000 per căutare)")